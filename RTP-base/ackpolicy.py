@@ -0,0 +1,71 @@
+"""When the receiver acknowledges DATA packets.
+
+A cumulative ACK (or a SACK) covers everything received before it, so the
+receiver does not need to answer every packet: it can hold the ACK back until
+several packets are waiting for it or a short delay has passed. Packets that
+arrive out of order, duplicates, and packets that fill a gap are always
+acknowledged at once, so that duplicate ACKs and SACK blocks still reach the
+sender as soon as a loss is noticed.
+"""
+import time
+
+IMMEDIATE = "immediate"  # One ACK per DATA packet
+EVERY = "every"  # One ACK per ``every`` packets, or after ``delay`` at the latest
+DELAYED = "delayed"  # One ACK ``delay`` seconds after the first unacknowledged packet
+POLICIES = (IMMEDIATE, EVERY, DELAYED)
+
+DEFAULT_ACK_EVERY = 2
+DEFAULT_ACK_DELAY = 0.002  # Seconds; well below the senders' minimum RTO
+
+
+class AckPolicy:
+    """Decides whether a received DATA packet is acknowledged right away.
+
+    The receiver calls ``on_data`` for every DATA packet and sends an ACK when
+    it returns True, then calls ``sent``. While ACKs are held back,
+    ``timeout`` bounds how long the receiver may block and ``due`` tells
+    whether the delay has run out.
+    """
+
+    def __init__(self, policy=IMMEDIATE, every=DEFAULT_ACK_EVERY, delay=DEFAULT_ACK_DELAY, on_gap=True):
+        if policy == IMMEDIATE:
+            every, delay = 1, 0.0
+        elif policy == DELAYED:
+            every = 0  # Only the delay releases an ACK
+        self.every = every
+        self.delay = delay
+        self.on_gap = on_gap
+        self.unacked = 0  # DATA packets received since the last ACK
+        self.unacked_since = 0.0
+
+    def on_data(self, in_order):
+        """Record a DATA packet; return True if an ACK should be sent now.
+
+        ``in_order`` is False for out-of-order packets, duplicates and packets
+        that fill a gap.
+        """
+        if not self.unacked:
+            self.unacked_since = time.monotonic()
+        self.unacked += 1
+        if self.on_gap and not in_order:
+            return True
+        if self.every and self.unacked >= self.every:
+            return True
+        if self.delay:
+            return time.monotonic() - self.unacked_since >= self.delay
+        return not self.every
+
+    def due(self):
+        """Return True if a held-back ACK has waited for ``delay``."""
+        if not self.unacked:
+            return False
+        return not self.delay or time.monotonic() - self.unacked_since >= self.delay
+
+    def timeout(self):
+        """Return how long the receiver may block before checking ``due``, or None for no limit."""
+        if self.unacked and self.delay:
+            return self.delay
+        return None
+
+    def sent(self):
+        self.unacked = 0
@@ -0,0 +1,170 @@
+"""Congestion control for the senders.
+
+Each algorithm keeps a congestion window ``cwnd`` in packets, which the sender
+uses instead of ``window_size`` to limit the packets in flight; ``window``
+never exceeds the ``window_size`` the sender was started with. The sender
+reports newly acknowledged packets with ``on_ack``, packets it resends ahead
+of their timer (duplicate ACKs or SACK holes) with ``on_loss``, and
+retransmission timeouts with ``on_timeout``.
+"""
+import time
+
+INITIAL_WINDOW = 10  # Packets (RFC 6928)
+MIN_SSTHRESH = 2
+
+CUBIC_C = 0.4  # RFC 8312 constants
+CUBIC_BETA = 0.7
+
+
+class CwndTrace:
+    """Writes one CSV line per congestion window change: time,cwnd,ssthresh,event."""
+
+    def __init__(self, path):
+        self.file = open(path, "w")
+        self.file.write("time,cwnd,ssthresh,event\n")
+        self.start = time.monotonic()
+
+    def record(self, now, cwnd, ssthresh, event):
+        self.file.write(f"{now - self.start:.6f},{cwnd:.3f},{ssthresh:.3f},{event}\n")
+
+    def close(self):
+        self.file.close()
+
+
+class FixedWindow:
+    """No congestion control: always allow ``max_window`` packets in flight."""
+
+    def __init__(self, max_window, trace=None):
+        self.max_window = max_window
+        self.cwnd = float(max_window)
+        self.ssthresh = float(max_window)
+        self.recovery = 0  # Losses below this sequence number belong to the last reaction
+        self.trace = trace
+
+    @property
+    def window(self):
+        """Packets the sender may have in flight."""
+        return max(1, min(int(self.cwnd), self.max_window))
+
+    def _record(self, now, event):
+        if self.trace:
+            self.trace.record(now, self.cwnd, self.ssthresh, event)
+
+    def on_ack(self, acked, now):
+        pass
+
+    def on_loss(self, seq_num, next_seq_num, now):
+        """Handle a packet resent ahead of its timer.
+
+        The window is reduced once per window of data: further losses of
+        packets sent before the first reaction are ignored.
+        """
+        if seq_num < self.recovery:
+            return
+        self.recovery = next_seq_num
+        self._reduce(now)
+        self._record(now, "loss")
+
+    def on_timeout(self, seq_num, next_seq_num, now):
+        """Handle the expiry of ``seq_num``'s retransmission timer.
+
+        Like ``on_loss``, this reacts once per window of data: timers of
+        packets sent before the last reaction expiring too are ignored.
+        """
+        if seq_num < self.recovery:
+            return
+        self.recovery = next_seq_num
+        self._restart(now)
+        self._record(now, "timeout")
+
+    def _reduce(self, now):
+        pass
+
+    def _restart(self, now):
+        pass
+
+
+class Reno(FixedWindow):
+    """Slow start and additive increase, multiplicative decrease (RFC 5681)."""
+
+    def __init__(self, max_window, trace=None):
+        super().__init__(max_window, trace)
+        self.cwnd = float(min(INITIAL_WINDOW, max_window))
+
+    def on_ack(self, acked, now):
+        if self.cwnd >= self.max_window:
+            return
+        if self.cwnd < self.ssthresh:
+            # Slow start: one packet per packet acknowledged
+            self.cwnd = min(self.cwnd + acked, self.ssthresh)
+        else:
+            # Congestion avoidance: one packet per window acknowledged
+            self.cwnd += acked / self.cwnd
+        self.cwnd = min(self.cwnd, self.max_window)
+        self._record(now, "ack")
+
+    def _reduce(self, now):
+        self.ssthresh = max(self.cwnd / 2, MIN_SSTHRESH)
+        self.cwnd = self.ssthresh
+
+    def _restart(self, now):
+        self.ssthresh = max(self.cwnd / 2, MIN_SSTHRESH)
+        self.cwnd = 1.0
+
+
+class Cubic(Reno):
+    """CUBIC window growth (RFC 8312) with Reno-friendly lower bound.
+
+    After a loss the window grows along a cubic curve centred on the window
+    before the loss, ``w_max``: quickly back towards it, flat around it, then
+    probing beyond it. Growth depends on the time since the loss rather than
+    on the ACK rate.
+    """
+
+    def __init__(self, max_window, trace=None):
+        super().__init__(max_window, trace)
+        self.w_max = 0.0
+        self.k = 0.0
+        self.epoch_start = None  # Start of the current congestion avoidance period
+        self.w_est = 0.0  # Window standard Reno would have reached
+
+    def on_ack(self, acked, now):
+        if self.cwnd >= self.max_window:
+            return
+        if self.cwnd < self.ssthresh:
+            self.cwnd = min(self.cwnd + acked, self.ssthresh)
+        else:
+            if self.epoch_start is None:
+                self.epoch_start = now
+                if self.cwnd < self.w_max:
+                    self.k = ((self.w_max - self.cwnd) / CUBIC_C) ** (1 / 3)
+                else:
+                    self.k = 0.0
+                    self.w_max = self.cwnd
+                self.w_est = self.cwnd
+            t = now - self.epoch_start
+            target = CUBIC_C * (t - self.k) ** 3 + self.w_max
+            self.w_est += 3 * (1 - CUBIC_BETA) / (1 + CUBIC_BETA) * acked / self.cwnd
+            if target > self.cwnd:
+                self.cwnd += (target - self.cwnd) / self.cwnd * acked
+            else:
+                self.cwnd += 0.01 * acked / self.cwnd
+            self.cwnd = max(self.cwnd, self.w_est)
+        self.cwnd = min(self.cwnd, self.max_window)
+        self._record(now, "ack")
+
+    def _reduce(self, now):
+        self.epoch_start = None
+        self.w_max = self.cwnd
+        self.ssthresh = max(self.cwnd * CUBIC_BETA, MIN_SSTHRESH)
+        self.cwnd = self.ssthresh
+
+    def _restart(self, now):
+        self.epoch_start = None
+        self.w_max = self.cwnd
+        self.ssthresh = max(self.cwnd * CUBIC_BETA, MIN_SSTHRESH)
+        self.cwnd = 1.0
+
+
+ALGORITHMS = {"none": FixedWindow, "reno": Reno, "cubic": Cubic}
+DEFAULT_ALGORITHM = "reno"
@@ -0,0 +1,115 @@
+"""XOR parity for forward error correction.
+
+DATA packets are split into groups of ``group_size`` consecutive sequence
+numbers, starting at 1. Each group gets ``parities`` PARITY packets;
+parity ``j`` is the XOR of the payloads of the group's packets ``j``,
+``j + parities``, ``j + 2 * parities`` and so on, and is sent with the
+sequence number of the first packet it covers. A receiver that has all but
+one packet covered by a parity rebuilds the missing one by XORing that
+parity with the packets it has, without waiting for a retransmission.
+Interleaving the parities means a burst of up to ``parities`` consecutive
+losses in a group can be rebuilt.
+
+Payloads are XORed as Python integers. Only groups whose packets all carry
+exactly ``chunk_size`` bytes get parity, so the short last packet of a
+transfer, and the group it belongs to, rely on retransmission alone.
+"""
+
+MAX_FEC_GROUP = 64  # Largest group size a receiver accepts
+
+
+class FecEncoder:
+    """Computes the parity packets of each group as the sender reads new DATA packets."""
+
+    def __init__(self, group_size, parities, chunk_size):
+        self.group_size = group_size
+        self.parities = parities
+        self.chunk_size = chunk_size
+        self.accumulators = [0] * parities
+        self.complete = True  # Every packet of the current group so far was full-size
+
+    def add(self, seq_num, payload):
+        """Add a new DATA packet; return the (seq_num, payload) parities of the group it completes, if any."""
+        offset = (seq_num - 1) % self.group_size
+        if offset == 0:
+            self.accumulators = [0] * self.parities
+            self.complete = True
+        if len(payload) != self.chunk_size:
+            self.complete = False
+        self.accumulators[offset % self.parities] ^= int.from_bytes(payload, "little")
+        if offset < self.group_size - 1 or not self.complete:
+            return ()
+        first = seq_num - offset
+        return [(first + j, acc.to_bytes(self.chunk_size, "little")) for j, acc in enumerate(self.accumulators)]
+
+
+class FecDecoder:
+    """Collects the DATA and PARITY packets of open groups and rebuilds single losses.
+
+    Each parity's packets are tracked separately, keyed by the sequence
+    number of the first packet it covers, as the XOR of the payloads that
+    arrived and a bitmask of which ones did.
+    """
+
+    def __init__(self, group_size, parities, chunk_size):
+        self.group_size = group_size
+        self.parities = parities
+        self.chunk_size = chunk_size
+        self.sets = {}  # First seq_num covered -> [XOR of arrivals, bitmask of DATA arrivals, parity arrived]
+        self.floor = 1  # Everything below has been delivered
+
+    def _members(self, key):
+        """Number of DATA packets covered by the parity sent as ``key``."""
+        return len(range((key - 1) % self.group_size, self.group_size, self.parities))
+
+    def add_data(self, seq_num, payload):
+        """Add a DATA packet; return the (seq_num, payload) it lets us rebuild, or None."""
+        if len(payload) != self.chunk_size:
+            return None
+        offset = (seq_num - 1) % self.group_size
+        key = seq_num - offset + offset % self.parities
+        entry = self.sets.get(key)
+        if entry is None:
+            entry = self.sets[key] = [0, 0, False]
+        bit = 1 << offset // self.parities
+        if entry[1] & bit:
+            return None
+        entry[0] ^= int.from_bytes(payload, "little")
+        entry[1] |= bit
+        return self._rebuild(key, entry)
+
+    def add_parity(self, key, payload):
+        """Add a PARITY packet; return the (seq_num, payload) it lets us rebuild, or None."""
+        if len(payload) != self.chunk_size or (key - 1) % self.group_size >= self.parities:
+            return None
+        if key + (self._members(key) - 1) * self.parities < self.floor:
+            return None  # Every packet it covers was delivered
+        entry = self.sets.get(key)
+        if entry is None:
+            entry = self.sets[key] = [0, 0, False]
+        if entry[2]:
+            return None
+        entry[0] ^= int.from_bytes(payload, "little")
+        entry[2] = True
+        return self._rebuild(key, entry)
+
+    def _rebuild(self, key, entry):
+        full = (1 << self._members(key)) - 1
+        missing = full & ~entry[1]
+        if not missing:
+            del self.sets[key]
+            return None
+        if not entry[2] or missing & (missing - 1):
+            return None  # No parity yet, or more than one packet missing
+        del self.sets[key]
+        return key + (missing.bit_length() - 1) * self.parities, entry[0].to_bytes(self.chunk_size, "little")
+
+    def discard_below(self, seq_num):
+        """Forget the sets whose packets are all below ``seq_num``, i.e. delivered."""
+        self.floor = seq_num
+        sets = self.sets
+        while sets:
+            key = next(iter(sets))
+            if key + (self._members(key) - 1) * self.parities >= seq_num:
+                break
+            del sets[key]
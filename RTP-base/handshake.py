@@ -0,0 +1,127 @@
+"""START and END exchanges that survive packet loss.
+
+The sender resends START with exponential backoff, from START_TIMEOUT, until
+its ACK arrives. A sender that asks for OPT_EARLY_DATA sends its first
+window of DATA right behind START instead of waiting a round trip for the
+ACK; the receiver holds DATA that arrives before its START and replays it
+once the connection exists. Such a receiver echoes OPT_EARLY_DATA, which
+also tells its START ACK apart from an ACK of DATA packet 1. A receiver
+without the extension does not echo it; the sender then takes its START ACK
+and resends the early DATA, which that receiver may have dropped.
+
+Every resent START is answered, so START ACKs arrive in duplicate, and a
+late one looks like the ACK of DATA packet 1. Receivers therefore always
+echo OPT_SACK, as 0 when they decline it, which gives every START ACK a
+payload that no DATA ACK has; the senders ignore ACKs with a payload once
+the handshake is over.
+
+END carries the sequence number after the last DATA packet, so that no
+DATA ACK can be taken for its ACK, and is resent every RTO until it is
+acknowledged. The receiver lingers after its last END to acknowledge
+repeated ENDs.
+
+The functions here block on the sender's socket; aio.py runs the same
+exchanges on an event loop, with the schedules of ``start_timeouts`` and
+``end_timeouts``.
+"""
+import select
+import time
+
+from codec import ACK, END, HEADER_SIZE, MAX_PACKET_SIZE, OPT_EARLY_DATA, decode_options, make_packet, unpack_header
+from rto import MAX_RTO
+from utils import verify_checksum
+
+START_TIMEOUT = 0.25  # Seconds to wait for the START ACK before the first retry
+START_ATTEMPTS = 5  # STARTs sent before giving up, about 8 seconds in all
+END_ATTEMPTS = 5
+
+
+def start_timeouts():
+    """Yield how long to wait for the START ACK after each START is sent."""
+    timeout = START_TIMEOUT
+    for _ in range(START_ATTEMPTS):
+        yield timeout
+        timeout *= 2
+
+
+def end_timeouts(rto):
+    """Yield how long to wait for the END ACK after each END is sent, from ``rto`` on."""
+    for _ in range(END_ATTEMPTS):
+        yield rto
+        rto = min(rto * 2, MAX_RTO)
+
+
+def _wait_for_ack(sock, buf, seq_num, timeout):
+    """Return the payload of the first ACK of ``seq_num`` within ``timeout`` seconds, or None.
+
+    Raises ConnectionRefusedError if the receiver's port is closed.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([sock], [], [], remaining)[0]:
+            return None
+        n = sock.recv_into(buf)
+        if n < HEADER_SIZE or not verify_checksum(buf[:n]):
+            continue
+        pkt_type, ack_seq, length, _ = unpack_header(buf)
+        if pkt_type == ACK and ack_seq == seq_num:
+            return buf[HEADER_SIZE:HEADER_SIZE + length]
+
+
+def wait_for_start_ack(sock, address, start_packet, sent_at, early_data=False):
+    """Wait for the ACK of ``start_packet``, sent at ``sent_at``, resending it with backoff.
+
+    Returns the options the receiver accepted and the handshake's RTT, or
+    None for the RTT if START had to be resent (Karn's rule). Returns
+    (None, None) if all START_ATTEMPTS went unanswered. With ``early_data``,
+    an ACK that does not echo OPT_EARLY_DATA may acknowledge DATA packet 1
+    instead, so an echoing ACK is waited for another round trip before it
+    is taken as the START ACK of a receiver without the extension.
+    """
+    buf = memoryview(bytearray(MAX_PACKET_SIZE))
+    fallback = None  # (accepted, RTT) of the first ACK without the echo
+    attempt_sent = sent_at
+    for attempt, timeout in enumerate(start_timeouts()):
+        if attempt:
+            sock.sendto(start_packet, address)
+            attempt_sent = time.monotonic()
+        deadline = attempt_sent + timeout
+        while True:
+            try:
+                payload = _wait_for_ack(sock, buf, 1, deadline - time.monotonic())
+            except ConnectionRefusedError:
+                continue  # No receiver yet; wait out this attempt
+            if payload is None:
+                break
+            now = time.monotonic()
+            accepted = decode_options(payload)
+            rtt = now - sent_at if not attempt else None
+            if early_data and OPT_EARLY_DATA not in accepted:
+                if fallback is None:
+                    fallback = accepted, rtt
+                    deadline = min(deadline, now + (now - attempt_sent))
+                continue
+            return accepted, rtt
+        if fallback is not None:
+            return fallback
+    return None, None
+
+
+def send_end(sock, address, seq_num, rto):
+    """Send END as ``seq_num`` until it is acknowledged, first after ``rto`` seconds.
+
+    Every DATA packet has been acknowledged by then, so a receiver that
+    has closed its port is taken to have finished too. Returns False if
+    END_ATTEMPTS ENDs went unanswered.
+    """
+    buf = memoryview(bytearray(MAX_PACKET_SIZE))
+    end_packet = make_packet(END, seq_num)
+    for timeout in end_timeouts(rto):
+        sock.sendto(end_packet, address)
+        try:
+            if _wait_for_ack(sock, buf, seq_num + 1, timeout) is not None:
+                return True
+        except ConnectionRefusedError:
+            return True
+    return False
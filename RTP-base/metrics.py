@@ -0,0 +1,135 @@
+"""Counters, histograms and sampled event traces for the sender and receiver.
+
+Counters are plain dict entries that the caller increments. Histograms count
+values in power-of-two buckets, so recording one costs a multiplication and
+an int.bit_length(). An EventTrace writes a fixed-size binary record for
+every ``sample``-th event; without one, callers skip tracing with a single
+``if events`` test. ``Metrics.summary()`` collects everything into a dict
+for the JSON summary written at the end of a transfer.
+"""
+import json
+import struct
+import sys
+import time
+
+SENDER_COUNTERS = ("data_sent", "retransmits", "timeouts", "acks", "dup_acks", "checksum_failures", "parity_sent")
+RECEIVER_COUNTERS = ("data_received", "acks_sent", "duplicates", "out_of_window", "checksum_failures",
+                     "parity_received", "fec_recovered", "early_data")
+
+# Event types in traces
+EV_SEND = 0  # DATA packet sent; value is its payload length
+EV_RETRANSMIT = 1  # DATA packet sent again
+EV_ACK = 2  # ACK or SACK received; seq_num is the ACK's sequence number
+EV_TIMEOUT = 3  # Retransmission timeout; seq_num is the window base
+EV_DATA = 4  # DATA packet received; value is its distance ahead of the expected one
+EV_DROP = 5  # DATA packet dropped outside the receive window
+EVENT_NAMES = ("send", "retransmit", "ack", "timeout", "data", "drop")
+
+EVENT = struct.Struct("!dBIi")  # Seconds since the trace started, type, seq_num, value
+HISTOGRAM_BUCKETS = 64
+
+
+class Histogram:
+    """Counts values in power-of-two buckets of ``unit``.
+
+    Bucket 0 holds values below one unit and bucket ``i`` those in
+    [2 ** (i - 1), 2 ** i) units.
+    """
+
+    def __init__(self, unit=1):
+        self.unit = unit
+        self.scale = 1 / unit
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0
+
+    def record(self, value):
+        self.buckets[min(int(value * self.scale).bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        """Return the upper bound, in units, of the bucket holding the given fraction of values."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return 2 ** i
+        return 2 ** (HISTOGRAM_BUCKETS - 1)
+
+    def summary(self):
+        """Count, mean and max in units, approximate percentiles and the non-empty buckets."""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count * self.scale if self.count else None,
+            "max": self.max * self.scale,
+            "p50": self.percentile(0.5),
+            "p99": self.percentile(0.99),
+            "buckets": {f"<{2 ** i}": n for i, n in enumerate(self.buckets) if n},
+        }
+
+
+class EventTrace:
+    """Writes every ``sample``-th event to ``path`` as a binary EVENT record."""
+
+    def __init__(self, path, sample=1):
+        self.file = open(path, "wb")
+        self.sample = sample
+        self.skipped = 0
+        self.start = time.monotonic()
+
+    def event(self, kind, seq_num, value=0):
+        self.skipped += 1
+        if self.skipped < self.sample:
+            return
+        self.skipped = 0
+        self.file.write(EVENT.pack(time.monotonic() - self.start, kind, seq_num, value))
+
+    def close(self):
+        self.file.close()
+
+
+def read_trace(path):
+    """Yield (seconds, event name, seq_num, value) from a trace written by EventTrace."""
+    with open(path, "rb") as f:
+        data = f.read()
+    for t, kind, seq_num, value in EVENT.iter_unpack(data[:len(data) - len(data) % EVENT.size]):
+        yield t, EVENT_NAMES[kind], seq_num, value
+
+
+class Metrics:
+    """Counters plus RTT and reorder depth histograms for one connection."""
+
+    def __init__(self, counters):
+        self.counters = dict.fromkeys(counters, 0)
+        self.rtt = Histogram(unit=1e-6)  # Microseconds
+        self.reorder = Histogram()  # Packets ahead of the expected one
+        self.start = time.monotonic()
+        self.end = None  # Set by finish(); until then summaries measure up to now
+
+    def finish(self):
+        self.end = time.monotonic()
+
+    def summary(self):
+        summary = {"seconds": (self.end or time.monotonic()) - self.start, "counters": dict(self.counters)}
+        if self.rtt.count:
+            summary["rtt_us"] = self.rtt.summary()
+        if self.reorder.count:
+            summary["reorder_depth"] = self.reorder.summary()
+        return summary
+
+
+def write_summary(summary, path):
+    """Write ``summary`` as JSON to ``path``, or to stderr for "-"."""
+    if path == "-":
+        json.dump(summary, sys.stderr, indent=2)
+        sys.stderr.write("\n")
+        return
+    with open(path, "w") as f:
+        json.dump(summary, f, indent=2)
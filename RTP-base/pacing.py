@@ -0,0 +1,63 @@
+"""Packet pacing for the senders.
+
+Without pacing the sender writes a whole window back to back, which overflows
+the receiver's (or the proxy's) socket buffer in one burst. A Pacer spaces
+DATA packets ``1 / rate`` seconds apart instead, where the rate is either
+fixed or derived from the congestion window as ``gain * cwnd / SRTT``, the
+rate that delivers one window per round trip.
+
+Waits shorter than ``SPIN_THRESHOLD`` are busy-waited on time.monotonic(),
+since select() cannot sleep that precisely; longer ones become the select()
+timeout of the sender's loop.
+"""
+import time
+
+PACING_GAIN = 1.25  # Pace a little faster than cwnd/SRTT so the window can still grow
+SPIN_THRESHOLD = 0.0002  # Seconds
+BURST = 2  # Packets that may be sent back to back after an idle period
+
+
+class Pacer:
+    """Release times for DATA packets at a fixed or cwnd/SRTT-derived rate.
+
+    ``rate`` is in packets per second; with None, packets are paced at
+    ``gain * cwnd / srtt`` once an RTT sample exists and are not paced before.
+    """
+
+    def __init__(self, rate=None, gain=PACING_GAIN, burst=BURST):
+        self.rate = rate
+        self.gain = gain
+        self.burst = burst
+        self.next_send = 0.0
+        self.waits = 0  # Packets the sender had to hold back for the pacer
+        self.wait_time = 0.0  # Total time they were held back, in seconds
+        self.waited_for = None  # next_send already counted in waits
+
+    def interval(self, cwnd, srtt):
+        """Return the gap to leave between two packets."""
+        if self.rate:
+            return 1 / self.rate
+        if srtt:
+            return srtt / (self.gain * cwnd)
+        return 0.0
+
+    def wait(self):
+        """Busy-wait through a short delay; return the delay left if it is too long for that."""
+        now = time.monotonic()
+        delay = self.next_send - now
+        if delay <= 0:
+            return 0.0
+        if self.waited_for != self.next_send:
+            self.waited_for = self.next_send
+            self.waits += 1
+            self.wait_time += delay
+        if delay > SPIN_THRESHOLD:
+            return delay
+        while time.monotonic() < self.next_send:
+            pass
+        return 0.0
+
+    def sent(self, now, interval):
+        """Schedule the next packet ``interval`` after one sent at ``now``."""
+        # Bank at most ``burst`` packets of credit while the sender was idle
+        self.next_send = max(self.next_send, now - (self.burst - 1) * interval) + interval
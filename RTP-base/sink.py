@@ -0,0 +1,140 @@
+"""Destinations for the receiver's in-order byte stream."""
+import io
+import os
+import time
+
+from window import ReorderBuffer
+
+DEFAULT_FLUSH_BYTES = 64 * 1024
+DEFAULT_FLUSH_INTERVAL = 0.01  # Seconds
+
+
+def write_all(fd, data):
+    """Write all of ``data`` to ``fd``, resuming after short writes."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+class StreamSink:
+    """Buffers out-of-order payloads in memory and writes them to a stream in order.
+
+    In-order payloads are coalesced into one buffer and written with a single
+    write once ``flush_bytes`` bytes or ``flush_packets`` packets are queued,
+    or once the oldest queued payload is ``flush_interval`` seconds old. A
+    zero disables that trigger. ``close()`` writes whatever is still queued.
+    """
+
+    def __init__(self, stream, window_size, chunk_size, flush_bytes=DEFAULT_FLUSH_BYTES,
+                 flush_packets=0, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.stream = stream
+        self.flush_bytes = flush_bytes
+        self.flush_packets = flush_packets
+        self.flush_interval = flush_interval
+        self.pending = ReorderBuffer(window_size, chunk_size)  # Out-of-order payloads
+        self.queued = bytearray()  # In-order payloads not yet written
+        self.queued_packets = 0
+        self.queued_since = None
+        try:
+            # Bypass the stream's own buffer and write the descriptor directly
+            self.fd = stream.fileno()
+            stream.flush()
+        except (AttributeError, io.UnsupportedOperation):
+            self.fd = None
+
+    def store(self, seq_num, payload):
+        self.pending.put(seq_num, payload)
+
+    def deliver(self, expected_seq_num):
+        """Queue every buffered payload from ``expected_seq_num`` on; return the new expected number."""
+        # Copy payloads out now: a slot can be reused as soon as the window moves
+        next_seq_num = self.pending.pop_run(expected_seq_num, self.queued)
+        if next_seq_num == expected_seq_num:
+            return expected_seq_num
+        if not self.queued_packets:
+            self.queued_since = time.monotonic()
+        self.queued_packets += next_seq_num - expected_seq_num
+        if self._flush_due():
+            self.flush()
+        return next_seq_num
+
+    def _flush_due(self):
+        if self.flush_bytes and len(self.queued) >= self.flush_bytes:
+            return True
+        if self.flush_packets and self.queued_packets >= self.flush_packets:
+            return True
+        if self.flush_interval and time.monotonic() - self.queued_since >= self.flush_interval:
+            return True
+        return not (self.flush_bytes or self.flush_packets or self.flush_interval)
+
+    def flush_timeout(self):
+        """Return how long the receiver may block before calling flush(), or None for no limit."""
+        if self.queued_packets and self.flush_interval:
+            return self.flush_interval
+        return None
+
+    def flush(self):
+        if not self.queued_packets:
+            return
+        if self.fd is None:
+            self.stream.write(self.queued)
+            self.stream.flush()
+        else:
+            write_all(self.fd, self.queued)
+        self.queued = bytearray()
+        self.queued_packets = 0
+        self.queued_since = None
+
+    def close(self):
+        self.flush()
+
+
+class FileSink:
+    """Writes every payload straight to its final offset in an output file.
+
+    Packet ``seq_num`` lands at ``offset + (seq_num - 1) * chunk_size``, so
+    out-of-order packets go to disk as soon as they arrive and only their
+    sequence numbers are kept in memory. All DATA packets but the last must
+    carry exactly ``chunk_size`` bytes, which is what the senders produce.
+
+    Given ``fd``, the sink writes to that open file instead of ``path`` and
+    leaves it open on close(); the stripes of a striped transfer share one
+    output file this way. A sink that opens ``path`` at a nonzero
+    ``offset`` keeps the bytes before it, for resumed transfers.
+    """
+
+    def __init__(self, path, window_size, chunk_size, offset=0, fd=None):
+        self.owns_fd = fd is None
+        if fd is None:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | (0 if offset else os.O_TRUNC), 0o644)
+        self.fd = fd
+        self.offset = offset
+        self.chunk_size = chunk_size
+        self.pending = ReorderBuffer(window_size)  # Sequence numbers written ahead of the expected one
+        self.size = offset
+
+    def store(self, seq_num, payload):
+        offset = self.offset + (seq_num - 1) * self.chunk_size
+        os.pwrite(self.fd, payload, offset)
+        self.size = max(self.size, offset + len(payload))
+        self.pending.put(seq_num)
+
+    def deliver(self, expected_seq_num):
+        """Return the next expected sequence number after the contiguous run on disk."""
+        return self.pending.pop_run(expected_seq_num)
+
+    def complete_bytes(self, expected_seq_num):
+        """Return the end of the contiguous bytes on disk before ``expected_seq_num``."""
+        # Only the last packet of a transfer is short, and nothing is written beyond it
+        return min(self.offset + (expected_seq_num - 1) * self.chunk_size, self.size)
+
+    def flush_timeout(self):
+        return None
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.owns_fd:
+            os.ftruncate(self.fd, self.size)
+            os.close(self.fd)
@@ -0,0 +1,122 @@
+"""Lazy, fixed-size chunking of the sender's input."""
+import io
+import mmap
+import os
+import select
+import sys
+
+
+def read_ready(stream, buf):
+    """Read into ``buf`` whatever ``stream`` has ready, without blocking.
+
+    Returns the number of bytes read, 0 at EOF, or None if no input is ready
+    yet. A stream with a file descriptor is read from the descriptor,
+    bypassing the stream's own buffer; any other stream's readinto() must
+    return None itself rather than block, like a non-blocking raw stream.
+    """
+    try:
+        fd = stream.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return stream.readinto(buf)
+    if not select.select([fd], [], [], 0)[0]:
+        return None
+    return os.readv(fd, [buf])
+
+
+class ChunkReader:
+    """Reads a binary stream in fixed-size chunks into a ring of reusable buffers.
+
+    The chunk for ``seq_num`` lives in slot ``seq_num % slots`` and stays valid
+    until ``seq_num + slots`` is read, so a ring as large as the send window
+    holds every unacknowledged payload without further copies.
+
+    The stream is never waited on: when it has no input ready, read() returns
+    None with ``waiting`` set, and keeps what it has of the chunk in the slot
+    for the next call, which must ask for the same ``seq_num``. Chunks are
+    filled whole, so that only the last one is short, unless
+    ``short_chunks`` is set; then a chunk goes out with whatever arrived
+    before the stream ran dry.
+    """
+
+    def __init__(self, stream, chunk_size, slots):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        ring = memoryview(bytearray(slots * chunk_size))
+        self.slots = [ring[i * chunk_size:(i + 1) * chunk_size] for i in range(slots)]
+        self.filled = 0  # Bytes of the next chunk already read
+        self.short_chunks = False
+        self.waiting = False
+        self.eof = False
+        self.bytes_read = 0
+
+    def read(self, seq_num):
+        """Return the next chunk as a view into the slot for ``seq_num``, or None.
+
+        None means EOF, or with ``waiting`` set, that the stream has no input ready.
+        """
+        self.waiting = False
+        if self.eof:
+            return None
+        buf = self.slots[seq_num % len(self.slots)]
+        while self.filled < self.chunk_size:
+            n = read_ready(self.stream, buf[self.filled:])
+            if n is None:
+                if self.short_chunks and self.filled:
+                    break
+                self.waiting = True
+                return None
+            if not n:
+                self.eof = True
+                break
+            self.filled += n
+        filled, self.filled = self.filled, 0
+        self.bytes_read += filled
+        if filled == 0:
+            return None
+        return buf[:filled]
+
+
+class MmapReader:
+    """Serves chunks of a file as slices of a read-only memory map.
+
+    Has the same interface as ChunkReader, but chunks are never copied: each
+    one is a memoryview into the page cache that stays valid for the whole
+    transfer. ``offset`` and ``length`` restrict it to one byte range of the
+    file, with the first chunk at ``offset``.
+    """
+
+    def __init__(self, path, chunk_size, offset=0, length=None):
+        self.chunk_size = chunk_size
+        with open(path, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            # Zero-length files cannot be mapped
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if file_size else b""
+        end = file_size if length is None else min(offset + length, file_size)
+        self.view = memoryview(data)[offset:end]
+        self.size = len(self.view)
+        self.waiting = False  # A mapped file always has its input ready
+        self.eof = self.size == 0
+        self.bytes_read = 0
+
+    def read(self, seq_num):
+        """Return the chunk for ``seq_num`` (numbered from 1), or None at EOF."""
+        offset = (seq_num - 1) * self.chunk_size
+        if offset >= self.size:
+            self.eof = True
+            return None
+        chunk = self.view[offset:offset + self.chunk_size]
+        self.bytes_read += len(chunk)
+        if offset + len(chunk) >= self.size:
+            self.eof = True
+        return chunk
+
+
+def open_input(path, chunk_size, slots, offset=0, length=None):
+    """Map the file at ``path``, or read stdin lazily if ``path`` is None.
+
+    ``offset`` and ``length`` restrict a file to one byte range, as in
+    MmapReader; stdin is read through a ring of ``slots`` chunks.
+    """
+    if path:
+        return MmapReader(path, chunk_size, offset, length)
+    return ChunkReader(sys.stdin.buffer, chunk_size, slots)
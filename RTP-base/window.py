@@ -0,0 +1,240 @@
+"""Preallocated ring buffers for the send window and the receive reorder buffer.
+
+Both index their state by ``seq_num % capacity`` and are only valid for up to
+``capacity`` consecutive sequence numbers, which the sliding window guarantees.
+"""
+from array import array
+from bisect import bisect_right
+
+from codec import DATA, HEADER_SIZE, pack_header_into
+
+RETRANSMITTED = -1.0  # Send time of a packet that has been resent
+
+
+class SendWindow:
+    """Per-packet state of the unacknowledged packets at the sender.
+
+    Headers live in one bytearray, send times in an array of doubles and ack
+    flags in a bytearray, so sending or acknowledging a packet allocates
+    nothing. Payloads are not copied; the window keeps the chunk view passed
+    to ``add``, which points into the reader's own ring or memory map.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        headers = memoryview(bytearray(capacity * HEADER_SIZE))
+        # One [header, chunk] list per slot, ready to hand to sendmsg
+        self.packets = [[headers[i * HEADER_SIZE:(i + 1) * HEADER_SIZE], b""] for i in range(capacity)]
+        self.sent_times = array("d", bytes(8 * capacity))
+        self.acked = bytearray(capacity)
+
+    def add(self, seq_num, chunk, now):
+        """Store ``chunk`` as DATA packet ``seq_num`` sent at ``now`` and return its buffers."""
+        slot = seq_num % self.capacity
+        packet = self.packets[slot]
+        pack_header_into(packet[0], DATA, seq_num, chunk)
+        packet[1] = chunk
+        self.sent_times[slot] = now
+        self.acked[slot] = 0
+        return packet
+
+    def packet(self, seq_num):
+        """Return the [header, chunk] buffers of ``seq_num`` for sendmsg."""
+        return self.packets[seq_num % self.capacity]
+
+    def sent_time(self, seq_num):
+        """Return when ``seq_num`` was sent, or None if it has been retransmitted."""
+        sent_time = self.sent_times[seq_num % self.capacity]
+        return None if sent_time == RETRANSMITTED else sent_time
+
+    def mark_retransmitted(self, seq_num):
+        self.sent_times[seq_num % self.capacity] = RETRANSMITTED
+
+    def any_retransmitted(self, seq_nums):
+        """Return whether any of ``seq_nums`` has been retransmitted.
+
+        An ACK that covers a retransmission gives no RTT sample (Karn's rule),
+        even from packets that were sent once: they may have waited at the
+        receiver for the resent hole before they could be acknowledged.
+        """
+        sent_times = self.sent_times
+        capacity = self.capacity
+        return any(sent_times[seq_num % capacity] == RETRANSMITTED for seq_num in seq_nums)
+
+    def is_acked(self, seq_num):
+        return self.acked[seq_num % self.capacity]
+
+    def mark_acked(self, seq_num):
+        """Mark ``seq_num`` acknowledged and return ``sent_time(seq_num)``."""
+        slot = seq_num % self.capacity
+        self.acked[slot] = 1
+        sent_time = self.sent_times[slot]
+        return None if sent_time == RETRANSMITTED else sent_time
+
+    def advance(self, base, next_seq_num):
+        """Return the first unacknowledged sequence number in [base, next_seq_num]."""
+        # Each packet is stepped over once, so a plain loop beats starting a scan
+        acked = self.acked
+        capacity = self.capacity
+        while base < next_seq_num and acked[base % capacity]:
+            base += 1
+        return base
+
+    def unacked(self, start, end):
+        """Yield the unacknowledged sequence numbers in [start, end).
+
+        Runs of acknowledged packets are skipped with bytearray.find, so large
+        SACKed regions cost C-speed scans rather than a Python loop.
+        """
+        acked = self.acked
+        capacity = self.capacity
+        seq_num = start
+        while seq_num < end:
+            slot = seq_num % capacity
+            stop = slot + min(end - seq_num, capacity - slot)
+            found = acked.find(0, slot, stop)
+            if found == -1:
+                seq_num += stop - slot
+                continue
+            seq_num += found - slot
+            yield seq_num
+            seq_num += 1
+
+    def mark_sacked(self, blocks, base, next_seq_num):
+        """Mark the packets that SACK blocks cover within [base, next_seq_num) acknowledged.
+
+        Returns the sequence numbers that were not acknowledged before.
+        """
+        newly_acked = []
+        for start, end in blocks:
+            newly_acked.extend(self.unacked(max(start, base), min(end, next_seq_num)))
+        for seq_num in newly_acked:
+            self.acked[seq_num % self.capacity] = 1
+        return newly_acked
+
+
+class ReorderBuffer:
+    """Out-of-order payloads at the receiver.
+
+    Payloads are copied into slot ``seq_num % capacity`` of one preallocated
+    bytearray, with their lengths in an array and occupancy in a bytearray
+    bitmap, instead of one bytes object and dict entry per packet. With
+    ``chunk_size=0`` only the sequence numbers present are tracked.
+
+    This is not faster than a dict in CPython: test_scripts/bench_window.py
+    measures about twice the time per packet, and about twice the peak
+    memory, since the whole window is allocated up front rather than only
+    the packets that arrive out of order. What it buys is a buffer whose
+    size is fixed when the connection starts, which --max-buffer bounds.
+    """
+
+    def __init__(self, capacity, chunk_size=0):
+        self.capacity = capacity
+        self.chunk_size = chunk_size
+        self.data = memoryview(bytearray(capacity * chunk_size))
+        self.lengths = array("I", bytes(4 * capacity))
+        self.seq_nums = array("Q", bytes(8 * capacity))
+        self.present = bytearray(capacity)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, seq_num):
+        slot = seq_num % self.capacity
+        return self.present[slot] and self.seq_nums[slot] == seq_num
+
+    def __iter__(self):
+        for slot in range(self.capacity):
+            if self.present[slot]:
+                yield self.seq_nums[slot]
+
+    def put(self, seq_num, payload=b""):
+        slot = seq_num % self.capacity
+        if self.chunk_size:
+            offset = slot * self.chunk_size
+            self.data[offset:offset + len(payload)] = payload
+            self.lengths[slot] = len(payload)
+        if not self.present[slot]:
+            self.present[slot] = 1
+            self.count += 1
+        self.seq_nums[slot] = seq_num
+
+    def pop(self, seq_num):
+        """Remove ``seq_num`` and return a view of its payload, valid until the slot is reused."""
+        slot = seq_num % self.capacity
+        self.present[slot] = 0
+        self.count -= 1
+        offset = slot * self.chunk_size
+        return self.data[offset:offset + self.lengths[slot]]
+
+    def pop_run(self, seq_num, out=None):
+        """Remove the contiguous run of packets starting at ``seq_num``.
+
+        Their payloads are appended to the bytearray ``out`` if one is given.
+        Returns the sequence number that follows the run.
+        """
+        present = self.present
+        seq_nums = self.seq_nums
+        capacity = self.capacity
+        while True:
+            slot = seq_num % capacity
+            if not present[slot] or seq_nums[slot] != seq_num:
+                return seq_num
+            present[slot] = 0
+            self.count -= 1
+            if out is not None:
+                offset = slot * self.chunk_size
+                out += self.data[offset:offset + self.lengths[slot]]
+            seq_num += 1
+
+
+class RangeSet:
+    """Disjoint half-open [start, end) ranges of sequence numbers, kept sorted.
+
+    The receiver records its out-of-order packets here to build SACK blocks.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, seq_num):
+        starts = self.starts
+        ends = self.ends
+        i = bisect_right(starts, seq_num)
+        if i and ends[i - 1] >= seq_num:
+            # Inside or right after the range that starts at or before seq_num
+            if ends[i - 1] == seq_num:
+                ends[i - 1] = seq_num + 1
+                if i < len(starts) and starts[i] == seq_num + 1:
+                    ends[i - 1] = ends[i]
+                    del starts[i], ends[i]
+        elif i < len(starts) and starts[i] == seq_num + 1:
+            starts[i] = seq_num
+        else:
+            starts.insert(i, seq_num)
+            ends.insert(i, seq_num + 1)
+
+    def discard_below(self, seq_num):
+        """Forget every sequence number below ``seq_num``."""
+        i = bisect_right(self.ends, seq_num)
+        del self.starts[:i], self.ends[:i]
+        if self.starts and self.starts[0] < seq_num:
+            self.starts[0] = seq_num
+
+    def blocks(self, limit, latest=None):
+        """Return up to ``limit`` ranges as SACK blocks.
+
+        The range containing ``latest`` comes first, as it carries the newest
+        information, followed by the others from the lowest up.
+        """
+        blocks = list(zip(self.starts, self.ends))
+        if latest is not None:
+            i = bisect_right(self.starts, latest) - 1
+            if i >= 0 and latest < self.ends[i]:
+                blocks.insert(0, blocks.pop(i))
+        return blocks[:limit]
@@ -0,0 +1,458 @@
+"""asyncio API for RTP, on the same wire format as sender.py and receiver.py.
+
+``send(stream, addr)`` transfers a stream to a receiver, and ``start_server``
+returns an RTPServer whose ``accept()`` yields one RTPConnection per
+transfer; reading a connection returns its data in order. Both sides are
+DatagramProtocols on ``loop.create_datagram_endpoint``: incoming packets are
+handled as they arrive and retransmissions are ``loop.call_at`` timers, so
+nothing polls, and one event loop can run many transfers at once.
+"""
+import asyncio
+
+from codec import (
+    START, END, DATA, ACK, SACK, HEADER_SIZE, MAX_PAYLOAD_SIZE, OPT_EARLY_DATA, OPT_SACK,
+    decode_options, decode_sack_blocks, encode_options, encode_sack_blocks, make_packet, unpack_header,
+)
+from congestion import ALGORITHMS, DEFAULT_ALGORITHM
+from handshake import end_timeouts, start_timeouts
+from rto import RttEstimator
+from stream import ChunkReader
+from timers import TimerHeap
+from utils import verify_checksum
+from window import RangeSet, ReorderBuffer, SendWindow
+
+DEFAULT_WINDOW = 128
+MAX_SACK_BLOCKS = 8
+DUP_ACK_THRESHOLD = 3  # Later packets SACKed before a hole is resent ahead of its timer
+CLOSE_LINGER = 2.0  # Seconds a finished connection keeps acknowledging END
+MAX_EARLY_SENDERS = 16  # Unknown senders whose early DATA is held until their START
+
+
+class _FileChunks:
+    """A ChunkReader over a binary file object, behind the async read() of _StreamChunks.
+
+    While the file has no input ready, read() waits for its descriptor to
+    become readable instead of blocking the event loop.
+    """
+
+    def __init__(self, stream, chunk_size, slots):
+        self.stream = stream
+        self.reader = ChunkReader(stream, chunk_size, slots)
+
+    @property
+    def eof(self):
+        return self.reader.eof
+
+    @property
+    def bytes_read(self):
+        return self.reader.bytes_read
+
+    async def read(self, seq_num):
+        chunk = self.reader.read(seq_num)
+        while chunk is None and self.reader.waiting:
+            await self._readable()
+            chunk = self.reader.read(seq_num)
+        return chunk
+
+    async def _readable(self):
+        loop = asyncio.get_running_loop()
+        fd = self.stream.fileno()
+        readable = loop.create_future()
+        loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+        try:
+            await readable
+        finally:
+            loop.remove_reader(fd)
+
+
+class _StreamChunks:
+    """Reads chunks from an asyncio.StreamReader."""
+
+    def __init__(self, stream, chunk_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.eof = False
+        self.bytes_read = 0
+
+    async def read(self, seq_num):
+        if self.eof:
+            return None
+        try:
+            chunk = await self.stream.readexactly(self.chunk_size)
+        except asyncio.IncompleteReadError as e:
+            chunk = e.partial
+            self.eof = True
+        self.bytes_read += len(chunk)
+        return chunk or None
+
+
+class _SendProtocol(asyncio.DatagramProtocol):
+    """Sender state for one transfer; ``run`` drives it and ACKs and timers update it."""
+
+    def __init__(self, window_size, sack_blocks, congestion):
+        self.loop = asyncio.get_running_loop()
+        self.window = SendWindow(window_size)
+        self.rtt = RttEstimator()
+        self.timers = TimerHeap()  # One retransmission deadline per unacked packet
+        self.cc = ALGORITHMS[congestion](window_size)
+        self.sack_blocks = sack_blocks
+        self.base = 1
+        self.next_seq_num = 1
+        self.recover_seq = 0  # Timers of packets below this that expire belong to the last timeout
+        self.recover_deadline = 0.0  # When the retransmissions made at the last timeout expire
+        self.transport = None
+        self.timer = None  # loop.call_at handle for the earliest retransmission deadline
+        self.timer_deadline = None
+        self.start_ack = self.loop.create_future()
+        self.end_ack = None
+        self.wakeup = None  # Set when the window may have opened
+        self.stats = {"timeouts": 0, "retransmits": 0}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def error_received(self, exc):
+        # ICMP errors such as port unreachable; keep retransmitting like the select loop,
+        # except for END: a receiver that has closed its port after the data is done
+        if isinstance(exc, ConnectionRefusedError) and self.end_ack is not None and not self.end_ack.done():
+            self.end_ack.set_result(None)
+
+    def datagram_received(self, data, addr):
+        if len(data) < HEADER_SIZE or not verify_checksum(data):
+            return  # Corrupted ACK, ignore
+        ack_type, ack_seq, length, _ = unpack_header(data)
+        payload = data[HEADER_SIZE:HEADER_SIZE + length]
+        if not self.start_ack.done():
+            if ack_type == ACK and ack_seq == 1:
+                self.start_ack.set_result(decode_options(payload))
+        elif self.end_ack is not None:
+            if ack_type == ACK and ack_seq == self.next_seq_num + 1 and not self.end_ack.done():
+                self.end_ack.set_result(None)
+        elif ack_type == ACK and not self.sack_blocks and not length:
+            # An ACK with a payload is a repeated START ACK
+            self._on_ack(ack_seq)
+        elif ack_type == SACK and self.sack_blocks:
+            self._on_sack(ack_seq, decode_sack_blocks(payload))
+
+    def _on_ack(self, ack_seq):
+        window = self.window
+        if self.base <= ack_seq < self.next_seq_num and not window.is_acked(ack_seq):
+            now = self.loop.time()
+            # Karn's rule: no RTT samples from retransmitted packets
+            sent_time = window.mark_acked(ack_seq)
+            if sent_time is not None:
+                self.rtt.sample(now - sent_time)
+            self.timers.cancel(ack_seq)
+            self.cc.on_ack(1, now)
+            self.base = window.advance(self.base, self.next_seq_num)
+            self._arm_timer()
+            self._wake()
+
+    def _on_sack(self, ack_seq, blocks):
+        window = self.window
+        blocks.append((self.base, ack_seq))
+        newly_acked = window.mark_sacked(blocks, self.base, self.next_seq_num)
+        if not newly_acked:
+            return
+        now = self.loop.time()
+        for seq in newly_acked:
+            self.timers.cancel(seq)
+        # Karn's rule: no sample if a retransmission is among the packets acknowledged
+        if not window.any_retransmitted(newly_acked):
+            self.rtt.sample(now - window.sent_time(max(newly_acked)))
+        self.cc.on_ack(len(newly_acked), now)
+        self.base = window.advance(self.base, self.next_seq_num)
+        # Resend holes that DUP_ACK_THRESHOLD later packets have overtaken, once each
+        highest = min(max(end for _, end in blocks), self.next_seq_num)
+        for seq in window.unacked(self.base, highest - DUP_ACK_THRESHOLD):
+            if window.sent_time(seq) is not None:
+                self._resend(seq, now)
+                self.cc.on_loss(seq, self.next_seq_num, now)
+        self._arm_timer()
+        self._wake()
+
+    def _send_data(self, chunk):
+        now = self.loop.time()
+        self.transport.sendto(b"".join(self.window.add(self.next_seq_num, chunk, now)))
+        self.timers.schedule(self.next_seq_num, now + self.rtt.rto)
+        self.next_seq_num += 1
+
+    def _resend(self, seq_num, now):
+        self.transport.sendto(b"".join(self.window.packet(seq_num)))
+        self.window.mark_retransmitted(seq_num)
+        self.timers.schedule(seq_num, now + self.rtt.rto)
+        self.stats["retransmits"] += 1
+
+    def _arm_timer(self):
+        """Point the loop timer at the earliest retransmission deadline."""
+        deadline = self.timers.next_deadline()
+        if deadline == self.timer_deadline:
+            return
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = self.loop.call_at(deadline, self._on_timer) if deadline is not None else None
+        self.timer_deadline = deadline
+
+    def _on_timer(self):
+        self.timer = self.timer_deadline = None
+        now = self.loop.time()
+        expired = self.timers.pop_expired(now)
+        if expired:
+            # Retransmit only the packets whose own timer has expired
+            self.stats["timeouts"] += 1
+            # Back off once per loss event, not once per timer of its flight
+            if max(expired) >= self.recover_seq or now >= self.recover_deadline:
+                self.rtt.backoff()
+                self.recover_seq = self.next_seq_num
+                self.recover_deadline = now + self.rtt.rto
+            self.cc.on_timeout(max(expired), self.next_seq_num, now)
+            for seq in expired:
+                self._resend(seq, now)
+        self._arm_timer()
+
+    def _wake(self):
+        if self.wakeup is not None and not self.wakeup.done():
+            self.wakeup.set_result(None)
+
+    async def _exchange(self, packet, ack, timeouts):
+        """Send ``packet`` until the future ``ack`` is set, waiting each of ``timeouts`` in turn.
+
+        Returns the attempt that was acknowledged, or None if none was.
+        """
+        for attempt, timeout in enumerate(timeouts):
+            self.transport.sendto(packet)
+            try:
+                await asyncio.wait_for(asyncio.shield(ack), timeout)
+                return attempt
+            except asyncio.TimeoutError:
+                pass
+        return None
+
+    async def run(self, reader):
+        options = {OPT_SACK: self.sack_blocks} if self.sack_blocks else {}
+        # Resend START with backoff, on the schedule of the select loop's handshake
+        sent_at = self.loop.time()
+        attempt = await self._exchange(make_packet(START, 0, encode_options(options)), self.start_ack,
+                                       start_timeouts())
+        if attempt is None:
+            raise TimeoutError("Timeout waiting for START ACK")
+        if not attempt:
+            # Karn's rule: only a START sent once gives an RTT sample
+            self.rtt.sample(self.loop.time() - sent_at)
+        accepted = self.start_ack.result()
+        # The receiver echoes the options it accepted; an older receiver echoes none
+        if not accepted.get(OPT_SACK, 0):
+            self.sack_blocks = 0
+
+        # Send until the stream is exhausted and everything read has been acknowledged
+        while True:
+            while self.next_seq_num < self.base + self.cc.window:
+                chunk = await reader.read(self.next_seq_num)
+                if chunk is None:
+                    break
+                self._send_data(chunk)
+            self._arm_timer()
+            if reader.eof and self.base == self.next_seq_num:
+                break
+            self.wakeup = self.loop.create_future()
+            await self.wakeup
+
+        if self.timer is not None:
+            self.timer.cancel()
+        # Resend END until it is acknowledged; the data already is, so giving up loses nothing
+        self.end_ack = self.loop.create_future()
+        await self._exchange(make_packet(END, self.next_seq_num), self.end_ack, end_timeouts(self.rtt.rto))
+        return reader.bytes_read
+
+
+async def send(stream, addr, window_size=DEFAULT_WINDOW, *, sack_blocks=MAX_SACK_BLOCKS,
+               congestion=DEFAULT_ALGORITHM):
+    """Send ``stream`` to the receiver at ``addr`` and return the number of bytes sent.
+
+    ``stream`` is an asyncio.StreamReader, or a binary file object, which is
+    read as its input becomes ready. Raises TimeoutError if the receiver
+    does not answer START.
+    """
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: _SendProtocol(window_size, sack_blocks, congestion), remote_addr=addr)
+    try:
+        if isinstance(stream, asyncio.StreamReader):
+            reader = _StreamChunks(stream, MAX_PAYLOAD_SIZE)
+        else:
+            reader = _FileChunks(stream, MAX_PAYLOAD_SIZE, window_size)
+        return await protocol.run(reader)
+    finally:
+        transport.close()
+
+
+class RTPConnection:
+    """One transfer accepted by an RTPServer.
+
+    ``read()`` returns the data received in order so far, waiting for more if
+    there is none, and b"" once the sender has ended the transfer; ``async
+    for`` iterates over the same chunks. If the reader falls more than a
+    window behind, new DATA is dropped unacknowledged until it catches up, so
+    the sender backs off instead of the buffer growing without bound.
+    """
+
+    def __init__(self, server, address, window_size, sack_blocks, options):
+        self.server = server
+        self.address = address
+        self.window_size = window_size
+        self.sack_blocks = sack_blocks
+        self.options = options  # Accepted START options, echoed in the START ACK
+        self.expected_seq_num = 1
+        self.pending = ReorderBuffer(window_size, MAX_PAYLOAD_SIZE)
+        self.sack_ranges = RangeSet()
+        self.data = bytearray()
+        self.limit = window_size * MAX_PAYLOAD_SIZE
+        self.finished = False
+        self.waiter = None
+
+    async def read(self):
+        while not self.data and not self.finished:
+            self.waiter = asyncio.get_running_loop().create_future()
+            await self.waiter
+        data = bytes(self.data)
+        self.data.clear()
+        return data
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        data = await self.read()
+        if not data:
+            raise StopAsyncIteration
+        return data
+
+    def _wake(self):
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    def _on_data(self, seq_num, payload):
+        """Buffer a DATA packet; return the ACK to send, or None."""
+        if seq_num >= self.expected_seq_num + self.window_size:
+            return None
+        if seq_num >= self.expected_seq_num:
+            if len(self.data) >= self.limit:
+                return None
+            self.pending.put(seq_num, payload)
+            if self.sack_blocks:
+                self.sack_ranges.add(seq_num)
+            expected_seq_num = self.pending.pop_run(self.expected_seq_num, self.data)
+            if expected_seq_num != self.expected_seq_num:
+                self.expected_seq_num = expected_seq_num
+                self._wake()
+        if not self.sack_blocks:
+            return make_packet(ACK, seq_num)
+        self.sack_ranges.discard_below(self.expected_seq_num)
+        blocks = self.sack_ranges.blocks(self.sack_blocks, seq_num)
+        return make_packet(SACK, self.expected_seq_num, encode_sack_blocks(blocks))
+
+    def _finish(self):
+        self.finished = True
+        self._wake()
+
+
+class RTPServer(asyncio.DatagramProtocol):
+    """Accepts RTP transfers on one UDP port, one connection per sender address.
+
+    Up to a window of DATA that overtakes a sender's START is kept, for
+    MAX_EARLY_SENDERS senders at a time, and handled once a START asking for
+    early data arrives.
+    """
+
+    def __init__(self, window_size=DEFAULT_WINDOW, max_sack_blocks=MAX_SACK_BLOCKS):
+        self.window_size = window_size
+        self.max_sack_blocks = max_sack_blocks
+        self.connections = {}  # Sender address -> RTPConnection
+        self.early = {}  # Sender address -> (seq_num, payload) of DATA that arrived before its START
+        self.accepted = asyncio.Queue()
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def error_received(self, exc):
+        pass
+
+    def datagram_received(self, data, addr):
+        if len(data) < HEADER_SIZE or not verify_checksum(data):
+            return  # Corrupted packet, ignore
+        pkt_type, seq_num, length, _ = unpack_header(data)
+        payload = memoryview(data)[HEADER_SIZE:HEADER_SIZE + length]
+        connection = self.connections.get(addr)
+        if pkt_type == START:
+            held = ()
+            if connection is None or connection.finished:
+                # Accept the requested extensions we support and echo them in the ACK
+                requested = decode_options(payload)
+                sack_blocks = min(requested.get(OPT_SACK, 0), self.max_sack_blocks)
+                # Echoed even as 0, so that the START ACK always has a payload
+                options = {OPT_SACK: sack_blocks}
+                if OPT_EARLY_DATA in requested:
+                    options[OPT_EARLY_DATA] = 1
+                    held = self.early.get(addr, ())
+                self.early.pop(addr, None)
+                connection = RTPConnection(self, addr, self.window_size, sack_blocks, options)
+                self.connections[addr] = connection
+                self.accepted.put_nowait(connection)
+            self.transport.sendto(make_packet(ACK, 1, encode_options(connection.options)), addr)
+            # Handle the DATA that overtook this START after it, as if it had just arrived
+            for held_seq_num, held_payload in held:
+                ack = connection._on_data(held_seq_num, held_payload)
+                if ack is not None:
+                    self.transport.sendto(ack, addr)
+        elif connection is None:
+            if pkt_type == DATA:
+                # Hold DATA sent right behind a START that is late or lost
+                held = self.early.get(addr)
+                if held is None:
+                    if len(self.early) >= MAX_EARLY_SENDERS:
+                        del self.early[next(iter(self.early))]  # Forget the oldest sender
+                    held = self.early[addr] = []
+                if len(held) < self.window_size:
+                    held.append((seq_num, bytes(payload)))
+        elif pkt_type == END:
+            if not connection.finished:
+                connection._finish()
+                asyncio.get_running_loop().call_later(CLOSE_LINGER, self._forget, addr, connection)
+            self.transport.sendto(make_packet(ACK, seq_num + 1), addr)
+        elif pkt_type == DATA and not connection.finished:
+            ack = connection._on_data(seq_num, payload)
+            if ack is not None:
+                self.transport.sendto(ack, addr)
+
+    def _forget(self, addr, connection):
+        if self.connections.get(addr) is connection:
+            del self.connections[addr]
+
+    async def accept(self):
+        """Wait for the next sender to START a transfer and return its connection."""
+        return await self.accepted.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.accept()
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+async def start_server(host, port, window_size=DEFAULT_WINDOW, *, max_sack_blocks=MAX_SACK_BLOCKS):
+    """Listen for RTP transfers on ``host``:``port`` and return the RTPServer."""
+    loop = asyncio.get_running_loop()
+    _, server = await loop.create_datagram_endpoint(
+        lambda: RTPServer(window_size, max_sack_blocks), local_addr=(host, port))
+    return server
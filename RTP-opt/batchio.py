@@ -0,0 +1,243 @@
+"""Batched datagram I/O.
+
+On Linux, recvmmsg(2) and sendmmsg(2) are called through ctypes, so one
+system call receives every datagram that is ready, or sends every datagram
+queued since the last flush. Elsewhere, or if libc lacks them, the same
+interface falls back to one recvfrom_into()/sendmsg() call per datagram. That
+still drains every ready datagram per wakeup, but it no longer saves system
+calls.
+
+The message headers, I/O vectors and socket addresses live in preallocated
+ctypes arrays that never move, and are updated through flat memoryviews
+rather than ctypes attribute access, which costs more than the system calls
+it saves. Sockets used with RecvBatch must be non-blocking; callers wait for
+them with select() and then drain them.
+"""
+import ctypes
+import errno
+import os
+import socket
+import sys
+
+from codec import MAX_PACKET_SIZE
+
+DEFAULT_BATCH = 64  # Datagrams per system call
+SOCKADDR_IN_SIZE = 16
+# Send errors of a full socket buffer or interface queue; the datagrams are lost
+_LOST_ERRNOS = (errno.EAGAIN, errno.EWOULDBLOCK, errno.ENOBUFS)
+
+
+class _Iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _Msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.c_void_p),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _Mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _Msghdr), ("msg_len", ctypes.c_uint)]
+
+
+# Indices into an array of struct mmsghdr viewed as unsigned 32-bit words
+_MMSG_WORDS = ctypes.sizeof(_Mmsghdr) // 4
+_NAMELEN_WORD = _Msghdr.msg_namelen.offset // 4
+_LEN_WORD = _Mmsghdr.msg_len.offset // 4
+# Index of iov_len in an array of struct iovec viewed as size_t words
+_SIZE_T = "Q" if ctypes.sizeof(ctypes.c_size_t) == 8 else "I"
+_IOV_WORDS = ctypes.sizeof(_Iovec) // ctypes.sizeof(ctypes.c_size_t)
+_IOV_LEN_WORD = _Iovec.iov_len.offset // ctypes.sizeof(ctypes.c_size_t)
+
+
+def _load_mmsg():
+    """Return libc's (recvmmsg, sendmmsg), or (None, None) if they are not available."""
+    if not sys.platform.startswith("linux"):
+        return None, None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        recvmmsg = libc.recvmmsg
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None, None
+    recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    recvmmsg.restype = ctypes.c_int
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return recvmmsg, sendmmsg
+
+
+_recvmmsg, _sendmmsg = _load_mmsg()
+HAVE_MMSG = _recvmmsg is not None
+
+
+def _raise_errno():
+    err = ctypes.get_errno()
+    raise OSError(err, os.strerror(err))
+
+
+def _message_arrays(count, size):
+    """Build ``count`` mmsghdrs, each with one iovec over its own ``size``-byte slot.
+
+    Returns (msgs, iovecs, slots buffer, names buffer); the buffers are ctypes
+    arrays so that their addresses stay valid.
+    """
+    msgs = (_Mmsghdr * count)()
+    iovecs = (_Iovec * count)()
+    buf = (ctypes.c_char * (count * size))()
+    names = (ctypes.c_char * (count * SOCKADDR_IN_SIZE))()
+    for i in range(count):
+        iovecs[i].iov_base = ctypes.addressof(buf) + i * size
+        iovecs[i].iov_len = size
+        hdr = msgs[i].msg_hdr
+        hdr.msg_name = ctypes.addressof(names) + i * SOCKADDR_IN_SIZE
+        hdr.msg_namelen = SOCKADDR_IN_SIZE
+        hdr.msg_iov = ctypes.addressof(iovecs[i])
+        hdr.msg_iovlen = 1
+    return msgs, iovecs, buf, names
+
+
+class RecvBatch:
+    """Receives every datagram that is ready on a socket into preallocated slots.
+
+    ``recv`` returns (datagram, address) pairs; the datagrams are views into
+    the slots and are only valid until the next call.
+    """
+
+    def __init__(self, sock, count=DEFAULT_BATCH, size=MAX_PACKET_SIZE, use_mmsg=True):
+        self.sock = sock
+        self.count = count
+        self.mmsg = use_mmsg and HAVE_MMSG
+        if self.mmsg:
+            self.msgs, self.iovecs, buf, names = _message_arrays(count, size)
+            self.words = memoryview(self.msgs).cast("B").cast("I")
+            self.names = memoryview(names).cast("B")
+            self.addresses = {}  # Raw sockaddr_in -> (host, port)
+            self.received = 0  # Messages whose msg_namelen the kernel overwrote
+        else:
+            buf = bytearray(count * size)
+        view = memoryview(buf).cast("B")
+        self.buf = buf
+        self.slots = [view[i * size:(i + 1) * size] for i in range(count)]
+
+    def recv(self):
+        """Return every datagram ready now, up to the batch size, without blocking."""
+        if not self.mmsg:
+            received = []
+            for slot in self.slots:
+                try:
+                    n, address = self.sock.recvfrom_into(slot)
+                except (BlockingIOError, InterruptedError):
+                    break
+                received.append((slot[:n], address))
+            return received
+
+        words = self.words
+        for i in range(self.received):
+            words[i * _MMSG_WORDS + _NAMELEN_WORD] = SOCKADDR_IN_SIZE
+        n = _recvmmsg(self.sock.fileno(), ctypes.addressof(self.msgs), self.count, socket.MSG_DONTWAIT, None)
+        if n < 0:
+            self.received = 0
+            if ctypes.get_errno() in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            _raise_errno()
+        self.received = n
+        slots = self.slots
+        return [(slots[i][:words[i * _MMSG_WORDS + _LEN_WORD]], self._address(i)) for i in range(n)]
+
+    def _address(self, i):
+        raw = self.names[i * SOCKADDR_IN_SIZE:i * SOCKADDR_IN_SIZE + 8].tobytes()
+        address = self.addresses.get(raw)
+        if address is None:
+            # sockaddr_in: family, port in network byte order, IPv4 address
+            address = (socket.inet_ntoa(raw[4:8]), int.from_bytes(raw[2:4], "big"))
+            self.addresses[raw] = address
+        return address
+
+
+class SendBatch:
+    """Queues datagrams and sends them together on ``flush``.
+
+    ``queue`` copies the datagram into a preallocated slot, so its buffers can
+    be reused right away. The batch flushes itself when it is full. Without
+    sendmmsg, ``queue`` sends the datagram at once with sendmsg. Datagrams
+    the kernel has no room for are dropped, as a congested link would drop
+    them, and left to the caller's retransmissions.
+    """
+
+    def __init__(self, sock, count=DEFAULT_BATCH, size=MAX_PACKET_SIZE, use_mmsg=True):
+        self.sock = sock
+        self.count = count
+        self.size = size
+        self.queued = 0
+        self.mmsg = use_mmsg and HAVE_MMSG
+        if not self.mmsg:
+            return
+        self.msgs, self.iovecs, buf, names = _message_arrays(count, size)
+        self.buf = memoryview(buf).cast("B")
+        self.iov_words = memoryview(self.iovecs).cast("B").cast(_SIZE_T)
+        self.names = memoryview(names).cast("B")
+        self.slot_addresses = [None] * count  # Destination currently in each slot's sockaddr
+        self.sockaddrs = {}  # (host, port) -> raw sockaddr_in
+
+    def __len__(self):
+        return self.queued
+
+    def queue(self, buffers, address):
+        """Queue one datagram made of ``buffers`` for ``address``."""
+        if not self.mmsg:
+            try:
+                self.sock.sendmsg(buffers, [], 0, address)
+            except OSError as e:
+                if e.errno not in _LOST_ERRNOS:
+                    raise
+            return
+        i = self.queued
+        if self.slot_addresses[i] != address:
+            self.names[i * SOCKADDR_IN_SIZE:(i + 1) * SOCKADDR_IN_SIZE] = self._sockaddr(address)
+            self.slot_addresses[i] = address
+        offset = start = i * self.size
+        for buf in buffers:
+            end = offset + len(buf)
+            self.buf[offset:end] = buf
+            offset = end
+        self.iov_words[i * _IOV_WORDS + _IOV_LEN_WORD] = offset - start
+        self.queued = i + 1
+        if self.queued == self.count:
+            self.flush()
+
+    def flush(self):
+        total = self.queued
+        if not total:
+            return
+        self.queued = 0
+        # sendmmsg may stop early, e.g. when interrupted; send the rest
+        sent = 0
+        fd = self.sock.fileno()
+        address = ctypes.addressof(self.msgs)
+        while sent < total:
+            n = _sendmmsg(fd, address + sent * ctypes.sizeof(_Mmsghdr), total - sent, 0)
+            if n < 0:
+                err = ctypes.get_errno()
+                if err == errno.EINTR:
+                    continue
+                if err in _LOST_ERRNOS:
+                    return  # The rest of the batch is lost
+                _raise_errno()
+            sent += n
+
+    def _sockaddr(self, address):
+        raw = self.sockaddrs.get(address)
+        if raw is None:
+            host, port = address
+            raw = (socket.AF_INET.to_bytes(2, sys.byteorder) + port.to_bytes(2, "big")
+                   + socket.inet_aton(socket.gethostbyname(host)) + bytes(8))
+            self.sockaddrs[address] = raw
+        return raw
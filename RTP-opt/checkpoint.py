@@ -0,0 +1,102 @@
+"""Receiver checkpoints for resuming interrupted transfers.
+
+A receiver writing a resumable transfer into a file keeps PATH.ckpt next to
+it, holding the transfer ID, the length of the file's complete prefix and
+the CRC32 of that prefix. The checkpoint is rewritten every
+CHECKPOINT_BYTES of progress and when the connection closes early, and
+removed once the transfer ends. A sender restarting the same transfer is
+told the prefix length in the START ACK and only sends the rest. The CRC
+is checked against the file first, so a file that changed starts over.
+
+Checkpoints survive the receiver process dying, not the machine: the
+output is not synced to disk before a checkpoint is written.
+"""
+import hashlib
+import os
+import struct
+import zlib
+
+CHECKPOINT = struct.Struct("!4sQQI")  # Magic, transfer ID, complete bytes, CRC32 of them
+MAGIC = b"RTPC"
+CHECKPOINT_BYTES = 16 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+
+
+def file_transfer_id(path):
+    """Return the resume ID of a transfer of ``path``, which stays the same while the file does.
+
+    The ID is derived from the file's name, size and modification time.
+    """
+    st = os.stat(path)
+    key = f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}".encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big") or 1  # 0 means no resume
+
+
+def file_crc(fd, start, end, crc=0):
+    """Return the CRC32 of bytes [start, end) of ``fd`` continuing from ``crc``, or None if the file is shorter."""
+    while start < end:
+        data = os.pread(fd, min(READ_SIZE, end - start), start)
+        if not data:
+            return None
+        crc = zlib.crc32(data, crc)
+        start += len(data)
+    return crc
+
+
+def resume_point(path, transfer_id):
+    """Return the (offset, CRC) ``transfer_id`` can resume ``path`` from; (0, 0) starts over."""
+    try:
+        with open(path + ".ckpt", "rb") as f:
+            magic, checkpoint_id, offset, crc = CHECKPOINT.unpack(f.read(CHECKPOINT.size))
+        fd = os.open(path, os.O_RDONLY)
+    except (OSError, struct.error):
+        return 0, 0
+    try:
+        if magic != MAGIC or checkpoint_id != transfer_id or file_crc(fd, 0, offset) != crc:
+            return 0, 0
+    finally:
+        os.close(fd)
+    return offset, crc
+
+
+class Checkpoint:
+    """Progress of transfer ``transfer_id`` into ``path``, whose first ``offset`` bytes have ``crc``.
+
+    The CRC is extended by reading back the bytes that became complete, so
+    the sink does not have to hash payloads as they arrive.
+    """
+
+    def __init__(self, path, transfer_id, offset=0, crc=0):
+        self.path = path + ".ckpt"
+        self.transfer_id = transfer_id
+        self.fd = os.open(path, os.O_RDONLY)
+        self.offset = offset
+        self.crc = crc
+
+    def update(self, complete):
+        """Note that the first ``complete`` bytes are on disk; save every CHECKPOINT_BYTES."""
+        if complete - self.offset >= CHECKPOINT_BYTES:
+            self.save(complete)
+
+    def save(self, complete):
+        if complete > self.offset:
+            self.crc = file_crc(self.fd, self.offset, complete, self.crc)
+            self.offset = complete
+        # Replace the old checkpoint atomically, so a crash leaves one or the other
+        temporary = self.path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(CHECKPOINT.pack(MAGIC, self.transfer_id, self.offset, self.crc))
+        os.replace(temporary, self.path)
+
+    def close(self, complete):
+        """Save the checkpoint at ``complete`` bytes for a later resume."""
+        self.save(complete)
+        os.close(self.fd)
+
+    def remove(self):
+        """Delete the checkpoint of a finished transfer."""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        os.close(self.fd)
@@ -0,0 +1,121 @@
+"""Struct-based encoding of the RTP header.
+
+Wire-compatible with the scapy ``PacketHeader`` in utils.py: four big-endian
+unsigned 32-bit integers (type, seq_num, length, checksum) followed by the
+payload, with the checksum being the CRC32 of the packet with a zeroed
+checksum field.
+
+Protocol extensions are negotiated in the START handshake. The sender lists
+the options it wants in the START payload and the receiver echoes the ones
+it accepts, possibly with smaller values, in the payload of the START ACK.
+A peer without extension support sends and ignores empty payloads, so both
+sides fall back to the original protocol.
+"""
+import struct
+
+from utils import header_checksum
+
+HEADER = struct.Struct("!IIII")
+HEADER_SIZE = HEADER.size
+CHECKSUM = struct.Struct("!I")
+CHECKSUM_OFFSET = 12
+
+# Packet types
+START = 0
+END = 1
+DATA = 2
+ACK = 3
+SACK = 4  # Cumulative ACK in seq_num plus selective ACK blocks in the payload
+PARITY = 5  # XOR of DATA payloads for forward error correction (see fec.py)
+PROBE = 6  # Path MTU probe, answered with its payload length in seq_num (see pmtu.py)
+
+# Default packet size; larger DATA payloads are negotiated with OPT_PAYLOAD
+MAX_PACKET_SIZE = 1472  # 1500 byte Ethernet frame - 20 byte IP - 8 byte UDP
+MAX_PAYLOAD_SIZE = MAX_PACKET_SIZE - HEADER_SIZE
+MAX_DATAGRAM_SIZE = 65507  # Largest UDP payload over IPv4
+MAX_PAYLOAD_LIMIT = MAX_DATAGRAM_SIZE - HEADER_SIZE
+
+# START options: (option id, value) pairs
+OPTION = struct.Struct("!HQ")
+OPT_SACK = 1  # Maximum number of SACK blocks per ACK
+OPT_TRANSFER = 2  # Random ID shared by the stripes of one striped transfer
+OPT_STRIPES = 3  # Number of stripes in the transfer
+OPT_OFFSET = 4  # Byte offset of this stripe in the transfer
+OPT_FEC_GROUP = 5  # DATA packets per FEC group
+OPT_FEC_PARITY = 6  # PARITY packets per FEC group
+OPT_COMPRESS = 7  # Compression method of the byte stream (see compress.py)
+OPT_PAYLOAD = 8  # DATA payload size in bytes
+OPT_EARLY_DATA = 9  # DATA may follow START before its ACK (see handshake.py)
+OPT_RESUME = 10  # ID of a transfer that may resume from a receiver checkpoint (see checkpoint.py)
+OPT_RESUME_OFFSET = 11  # In the START ACK: bytes of the input the receiver already has
+OPT_SHORT_CHUNKS = 12  # DATA before the last packet may be short (see stream.py)
+
+# SACK blocks: half-open [start, end) ranges of sequence numbers
+SACK_BLOCK = struct.Struct("!II")
+MAX_SACK_BLOCKS = MAX_PAYLOAD_SIZE // SACK_BLOCK.size
+
+
+def pack_into(buf, pkt_type, seq_num, payload=b""):
+    """Write a checksummed packet into ``buf`` and return its length."""
+    length = len(payload)
+    end = HEADER_SIZE + length
+    HEADER.pack_into(buf, 0, pkt_type, seq_num, length, 0)
+    buf[HEADER_SIZE:end] = payload
+    CHECKSUM.pack_into(buf, CHECKSUM_OFFSET, header_checksum(buf, payload))
+    return end
+
+
+def pack_header_into(header, pkt_type, seq_num, payload=b""):
+    """Write the checksummed header for ``payload`` into the 16-byte buffer ``header``."""
+    HEADER.pack_into(header, 0, pkt_type, seq_num, len(payload), 0)
+    CHECKSUM.pack_into(header, CHECKSUM_OFFSET, header_checksum(header, payload))
+
+
+def make_header(pkt_type, seq_num, payload=b""):
+    """Return the checksummed header for ``payload`` without copying the payload.
+
+    The header and payload can then go out together with ``socket.sendmsg``.
+    """
+    header = bytearray(HEADER_SIZE)
+    pack_header_into(header, pkt_type, seq_num, payload)
+    return header
+
+
+def make_packet(pkt_type, seq_num, payload=b""):
+    """Return a new checksummed packet."""
+    buf = bytearray(HEADER_SIZE + len(payload))
+    pack_into(buf, pkt_type, seq_num, payload)
+    return buf
+
+
+def unpack_header(pkt):
+    """Return ``(type, seq_num, length, checksum)`` from the start of ``pkt``."""
+    return HEADER.unpack_from(pkt)
+
+
+def encode_options(options):
+    """Encode a dict of START options as a packet payload."""
+    payload = bytearray(OPTION.size * len(options))
+    for i, (option, value) in enumerate(sorted(options.items())):
+        OPTION.pack_into(payload, i * OPTION.size, option, value)
+    return payload
+
+
+def decode_options(payload):
+    """Decode a START or START ACK payload into a dict; unknown options are kept."""
+    count = len(payload) // OPTION.size
+    return dict(OPTION.unpack_from(payload, i * OPTION.size) for i in range(count))
+
+
+def encode_sack_blocks(blocks):
+    """Encode (start, end) ranges as a SACK payload."""
+    payload = bytearray(SACK_BLOCK.size * len(blocks))
+    for i, (start, end) in enumerate(blocks):
+        SACK_BLOCK.pack_into(payload, i * SACK_BLOCK.size, start, end)
+    return payload
+
+
+def decode_sack_blocks(payload):
+    """Decode a SACK payload into a list of (start, end) ranges."""
+    count = len(payload) // SACK_BLOCK.size
+    return [SACK_BLOCK.unpack_from(payload, i * SACK_BLOCK.size) for i in range(count)]
@@ -0,0 +1,153 @@
+"""Block compression of the transferred byte stream.
+
+The sender cuts its input into blocks of BLOCK_SIZE bytes and compresses
+each one on its own with the method agreed in START. Each block goes out as
+a FRAME header (kind, length) followed by the block's bytes, and the framed
+stream is then split into DATA packets like any other input. A block that
+does not shrink is sent raw instead. After such a block the sender stops
+trying to compress for a while, doubling the pause each time up to
+MAX_SKIP_BLOCKS, so incompressible input costs little CPU. The receiver
+decodes frames as in-order data is written out; the level only matters to
+the sender.
+"""
+import lzma
+import struct
+import zlib
+
+from stream import read_ready
+
+# Methods, as negotiated in OPT_COMPRESS
+ZLIB = 1
+LZMA = 2
+METHODS = {"zlib": ZLIB, "lzma": LZMA}
+LEVELS = {
+    ZLIB: {"fast": 1, "dense": 9},
+    LZMA: {"fast": 0, "dense": 9 | lzma.PRESET_EXTREME},
+}
+
+BLOCK_SIZE = 64 * 1024
+MAX_SKIP_BLOCKS = 64
+
+FRAME = struct.Struct("!BI")  # Kind, length of the bytes that follow
+RAW_FRAME = 0
+COMPRESSED_FRAME = 1
+
+
+def compress_block(method, level, block):
+    if method == ZLIB:
+        return zlib.compress(block, level)
+    return lzma.compress(block, preset=level, check=lzma.CHECK_NONE)
+
+
+def decompress_block(method, data):
+    if method == ZLIB:
+        return zlib.decompress(data)
+    return lzma.decompress(data, format=lzma.FORMAT_XZ)
+
+
+class CompressingReader:
+    """Binary stream of the frames holding ``source``'s compressed blocks.
+
+    Only readinto() is provided, which is all ChunkReader needs. Like a
+    non-blocking raw stream, it returns None while ``source`` has no input
+    ready, and keeps the part of a block read so far for the next call.
+    """
+
+    def __init__(self, source, method, level, block_size=BLOCK_SIZE):
+        self.source = source
+        self.method = method
+        self.level = level
+        self.block = bytearray(block_size)
+        self.filled = 0  # Bytes of the next block already read
+        self.frame = b""  # Framed bytes not yet read
+        self.position = 0
+        self.skip = 0  # Blocks still to send raw without trying to compress them
+        self.backoff = 1
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.raw_blocks = 0
+
+    def _read_block(self):
+        """Fill self.block from the source; return the bytes read, or None if it has no input ready."""
+        view = memoryview(self.block)
+        while self.filled < len(view):
+            n = read_ready(self.source, view[self.filled:])
+            if n is None:
+                return None
+            if not n:
+                break
+            self.filled += n
+        filled, self.filled = self.filled, 0
+        return view[:filled]
+
+    def _next_frame(self):
+        """Frame the next block; return False at EOF, or None if the source has no input ready."""
+        block = self._read_block()
+        if block is None:
+            return None
+        if not block:
+            return False
+        data = None
+        if self.skip:
+            self.skip -= 1
+        else:
+            data = compress_block(self.method, self.level, block)
+            if len(data) >= len(block):
+                data = None
+                self.skip = self.backoff
+                self.backoff = min(self.backoff * 2, MAX_SKIP_BLOCKS)
+            else:
+                self.backoff = 1
+        if data is None:
+            self.raw_blocks += 1
+            self.frame = FRAME.pack(RAW_FRAME, len(block)) + block
+        else:
+            self.frame = FRAME.pack(COMPRESSED_FRAME, len(data)) + data
+        self.position = 0
+        self.bytes_in += len(block)
+        self.bytes_out += len(self.frame)
+        return True
+
+    def readinto(self, buf):
+        if self.position == len(self.frame):
+            framed = self._next_frame()
+            if framed is None:
+                return None
+            if not framed:
+                return 0
+        n = min(len(buf), len(self.frame) - self.position)
+        buf[:n] = self.frame[self.position:self.position + n]
+        self.position += n
+        return n
+
+
+class DecompressingWriter:
+    """Write-only stream that decodes the frames written to it into ``stream``.
+
+    Frames may be split across writes; the bytes of an incomplete frame wait
+    for the next write.
+    """
+
+    def __init__(self, stream, method):
+        self.stream = stream
+        self.method = method
+        self.pending = bytearray()
+
+    def write(self, data):
+        pending = self.pending
+        pending += data
+        offset = 0
+        while len(pending) - offset >= FRAME.size:
+            kind, length = FRAME.unpack_from(pending, offset)
+            end = offset + FRAME.size + length
+            if end > len(pending):
+                break
+            block = memoryview(pending)[offset + FRAME.size:end]
+            self.stream.write(block if kind == RAW_FRAME else decompress_block(self.method, block))
+            block.release()
+            offset = end
+        del pending[:offset]
+        return len(data)
+
+    def flush(self):
+        self.stream.flush()
@@ -0,0 +1,104 @@
+"""Path MTU probing.
+
+The sender finds the largest DATA payload that reaches the receiver without
+IP fragmentation by sending PROBE packets of that payload size with the
+don't-fragment bit set. The receiver answers every PROBE with an empty PROBE
+whose seq_num is the payload length that arrived. Probes that are dropped,
+rejected locally with EMSGSIZE, or never answered count as too large, and a
+binary search narrows the size down. A receiver that does not know PROBE
+never answers, and probing gives up.
+
+Setting the don't-fragment bit needs the Linux IP_MTU_DISCOVER socket
+option; elsewhere probes are sent as usual and only find the largest size
+the receiver accepts.
+"""
+import errno
+import select
+import socket
+import sys
+import time
+
+from codec import HEADER_SIZE, MAX_PACKET_SIZE, MAX_PAYLOAD_SIZE, PROBE, make_packet, unpack_header
+from utils import verify_checksum
+
+# From <linux/in.h>; the socket module does not export them
+IP_MTU_DISCOVER = 10
+IP_PMTUDISC_PROBE = 3  # Set DF and ignore the cached path MTU
+
+MIN_PROBE_PAYLOAD = 512
+PROBE_TIMEOUT = 0.2  # Seconds to wait for each probe's answer
+PROBE_ATTEMPTS = 2  # Probes of one size before it counts as too large
+PROBE_PRECISION = 16  # Stop once the largest good and smallest bad size are this close
+
+
+def _set_dont_fragment(sock):
+    """Set DF on ``sock``'s datagrams; return the previous setting, or None where unsupported."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        previous = sock.getsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER)
+        sock.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_PROBE)
+    except OSError:
+        return None
+    return previous
+
+
+def _probe(sock, address, payload_size, buf):
+    """Return True if a PROBE with ``payload_size`` bytes of payload is answered."""
+    packet = make_packet(PROBE, payload_size, bytes(payload_size))
+    for _ in range(PROBE_ATTEMPTS):
+        try:
+            sock.sendto(packet, address)
+        except OSError as e:
+            if e.errno == errno.EMSGSIZE:
+                return False  # Larger than the local interface's MTU
+            raise
+        deadline = time.monotonic() + PROBE_TIMEOUT
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([sock], [], [], remaining)[0]:
+                break
+            try:
+                n = sock.recv_into(buf)
+            except ConnectionRefusedError:
+                return False
+            if n < HEADER_SIZE or not verify_checksum(buf[:n]):
+                continue
+            pkt_type, seq_num, _, _ = unpack_header(buf)
+            if pkt_type == PROBE and seq_num == payload_size:
+                return True
+    return False
+
+
+def probe_payload_size(sock, address, limit):
+    """Return the largest payload size up to ``limit`` that reaches ``address`` unfragmented.
+
+    Returns None if no probe was answered at all.
+    """
+    buf = memoryview(bytearray(MAX_PACKET_SIZE))
+    previous = _set_dont_fragment(sock)
+    sock.setblocking(False)
+    try:
+        if _probe(sock, address, limit, buf):
+            return limit
+        good, bad = 0, limit
+        # Usually the default size gets through and only the range above it is searched
+        for size in (MAX_PAYLOAD_SIZE, MIN_PROBE_PAYLOAD):
+            if size < bad:
+                if _probe(sock, address, size, buf):
+                    good = size
+                    break
+                bad = size
+        if not good:
+            return None
+        while bad - good > PROBE_PRECISION:
+            middle = (good + bad) // 2
+            if _probe(sock, address, middle, buf):
+                good = middle
+            else:
+                bad = middle
+        return good
+    finally:
+        sock.setblocking(True)
+        if previous is not None:
+            sock.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, previous)
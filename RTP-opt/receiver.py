@@ -1,76 +1,463 @@
 import argparse
+import asyncio
+import os
+import select
+import signal
 import socket
 import sys
-from utils import PacketHeader, compute_checksum
+import time
+from codec import (START, END, DATA, ACK, SACK, PARITY, PROBE, HEADER_SIZE, MAX_PACKET_SIZE,
+                   MAX_PAYLOAD_LIMIT, MAX_PAYLOAD_SIZE, OPT_COMPRESS, OPT_EARLY_DATA, OPT_FEC_GROUP,
+                   OPT_FEC_PARITY, OPT_OFFSET, OPT_PAYLOAD, OPT_RESUME, OPT_RESUME_OFFSET, OPT_SACK, OPT_SHORT_CHUNKS,
+                   OPT_STRIPES, OPT_TRANSFER, MAX_SACK_BLOCKS as SACK_BLOCK_LIMIT,
+                   decode_options, encode_options, encode_sack_blocks, pack_into, unpack_header)
+import aio
+from ackpolicy import DEFAULT_ACK_DELAY, DEFAULT_ACK_EVERY, IMMEDIATE, POLICIES, AckPolicy
+from batchio import DEFAULT_BATCH, RecvBatch, SendBatch
+from checkpoint import Checkpoint, resume_point
+from compress import METHODS, DecompressingWriter
+from fec import MAX_FEC_GROUP, FecDecoder
+from metrics import EV_DATA, EV_DROP, RECEIVER_COUNTERS, EventTrace, Metrics, write_summary
+from sink import DEFAULT_FLUSH_BYTES, DEFAULT_FLUSH_INTERVAL, FileSink, StreamSink
+from utils import verify_checksum
+from window import RangeSet
 
-def receiver(receiver_ip, receiver_port, window_size):
+MAX_SACK_BLOCKS = 8
+DEFAULT_IDLE_TIMEOUT = 30.0  # Seconds without a packet before a connection is dropped
+DEFAULT_LINGER = 0.5  # Seconds to keep acknowledging repeated ENDs before returning
+MAX_EARLY_SENDERS = 16  # Unknown senders whose early DATA is held until their START
+
+
+class StripedTransfer:
+    """The output file shared by the stripes of one striped transfer."""
+
+    def __init__(self, transfer_id, path, stripes):
+        self.transfer_id = transfer_id
+        self.path = path
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        self.open_stripes = stripes  # Stripes not yet finished or timed out
+
+    def stripe_closed(self):
+        """Count one stripe as done; close the file after the last one."""
+        self.open_stripes -= 1
+        if not self.open_stripes:
+            os.close(self.fd)
+
+
+class Connection:
+    """Receive state for one sender, keyed by its address."""
+
+    def __init__(self, address, sink, window_size, sack_blocks, accepted, acks, output=None, transfer=None,
+                 fec=None, checkpoint=None):
+        self.address = address
+        self.sink = sink
+        self.output = output  # File the sink writes to, closed with the connection
+        self.transfer = transfer  # StripedTransfer this connection is one stripe of
+        self.window_size = window_size  # Packets accepted beyond expected_seq_num
+        self.sack_blocks = sack_blocks  # SACK blocks per ACK agreed in START; 0 for plain ACKs
+        self.accepted = accepted  # Options echoed in the START ACK
+        self.acks = acks
+        self.fec = fec  # FecDecoder if FEC was agreed in START
+        self.checkpoint = checkpoint  # Checkpoint of a resumable transfer into a file
+        self.expected_seq_num = 1
+        self.sack_ranges = RangeSet()  # Out-of-order packets, reported in SACK blocks
+        self.latest_seq_num = 0  # Last DATA packet received, reported in the first SACK block
+        self.last_active = time.monotonic()
+        self.finished = False  # END received; kept until idle only to acknowledge repeated ENDs
+        self.metrics = Metrics(RECEIVER_COUNTERS)
+
+    def pack_sack(self, buf):
+        """Pack a SACK for everything received so far into ``buf`` and return its length."""
+        self.sack_ranges.discard_below(self.expected_seq_num)
+        blocks = self.sack_ranges.blocks(self.sack_blocks, self.latest_seq_num)
+        return pack_into(buf, SACK, self.expected_seq_num, encode_sack_blocks(blocks))
+
+    def recover(self, seq_num, payload):
+        """Store a DATA packet rebuilt from parity; return False if it is outside the window."""
+        if not self.expected_seq_num <= seq_num < self.expected_seq_num + self.window_size:
+            return False
+        self.sink.store(seq_num, payload)
+        if self.sack_blocks:
+            self.sack_ranges.add(seq_num)
+        self.metrics.counters["fec_recovered"] += 1
+        return True
+
+    def close(self, ended=False):
+        """Close the output; ``ended`` means the sender's END arrived and the transfer is complete."""
+        self.sink.close()
+        if self.output is not None:
+            self.output.close()
+        if self.transfer is not None:
+            self.transfer.stripe_closed()
+        if self.checkpoint is not None:
+            if ended:
+                self.checkpoint.remove()
+            else:
+                # Keep the complete prefix for the sender to resume after
+                self.checkpoint.close(self.sink.complete_bytes(self.expected_seq_num))
+        self.metrics.finish()
+        self.finished = True
+
+    def summary(self):
+        return {"address": f"{self.address[0]}:{self.address[1]}", **self.metrics.summary()}
+
+def receiver(receiver_ip, receiver_port, window_size, output_path=None,
+             flush_bytes=DEFAULT_FLUSH_BYTES, flush_packets=0, flush_interval=DEFAULT_FLUSH_INTERVAL,
+             max_sack_blocks=MAX_SACK_BLOCKS, ack_policy=IMMEDIATE, ack_every=DEFAULT_ACK_EVERY,
+             ack_delay=DEFAULT_ACK_DELAY, ack_on_gap=True, batch_size=DEFAULT_BATCH,
+             output_dir=None, idle_timeout=DEFAULT_IDLE_TIMEOUT, max_buffer=0,
+             metrics_path=None, event_trace=None, trace_sample=1, max_payload=MAX_PAYLOAD_SIZE,
+             linger=DEFAULT_LINGER):
+    """Receive transfers on one UDP port.
+
+    Without ``output_dir``, the first sender's stream goes to
+    ``output_path`` (or stdout) and the receiver returns ``linger`` seconds
+    after its last END, acknowledging repeated ENDs until then; other
+    senders are ignored. With ``output_dir``, it serves any number of
+    concurrent senders until interrupted, keyed by source address, and
+    writes each stream to its own file there. The stripes of a striped
+    transfer each arrive from their own address and are written at their
+    offsets into one file; they need ``output_path`` or ``output_dir``.
+    Connections that go ``idle_timeout`` seconds without a packet are
+    dropped. ``max_buffer`` caps the bytes each connection buffers:
+    out-of-order packets beyond it are dropped, and in-order data is written
+    once that much is queued. Senders may negotiate DATA payloads of up to
+    ``max_payload`` bytes, and the receive buffers are sized for them. A
+    sender resuming a transfer into ``output_path`` only sends what the
+    file's checkpoint (see checkpoint.py) says is missing, and takes over
+    from its own unfinished connection if it was restarted. DATA that
+    arrives before its sender's START, up to a window from each of
+    MAX_EARLY_SENDERS senders, is held and replayed if the START asks for
+    early data.
+
+    With ``metrics_path``, a JSON summary of every connection's counters and
+    histograms is written there on return; ``event_trace`` records DATA
+    arrivals and drops of all connections in one trace.
+    """
     # Create UDP socket
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     s.bind((receiver_ip, receiver_port))
+    packet_size = HEADER_SIZE + max_payload  # Largest DATA packet a sender may negotiate
+    if max_payload > MAX_PAYLOAD_SIZE:
+        # Room for a window of large packets
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, window_size * packet_size)
     
     # Initialize variables
-    expected_seq_num = 0
-    buffer = {}  # For out-of-order packets
-    connection_active = False
+    if max_buffer:
+        flush_bytes = min(flush_bytes or max_buffer, max_buffer)
+    connections = {}  # Sender address -> Connection
+    transfers = {}  # Transfer ID -> StripedTransfer with stripes still open
+    accepted_count = 0
+    summaries = []  # Metrics of the connections no longer in connections
+    early = {}  # Sender address -> DATA packets that arrived before its START
+    linger_until = None  # Without output_dir: when to return after the last END
+    events = EventTrace(event_trace, trace_sample) if event_trace else None
+    # Wait in select(), then drain every ready datagram and send the ACKs in one batch
+    s.setblocking(False)
+    incoming = RecvBatch(s, batch_size, packet_size)
+    outgoing = SendBatch(s, batch_size)
+    ack_views = [memoryview(bytearray(MAX_PACKET_SIZE)) for _ in range(batch_size)]  # One per queued ACK
     
-    while True:
-        # Receive packet
-        pkt, address = s.recvfrom(1472)
-        
-        # Extract header and payload
-        pkt_header = PacketHeader(pkt[:16])
-        msg = pkt[16:16+pkt_header.length]
-        
-        # Verify checksum
-        original_checksum = pkt_header.checksum
-        pkt_header.checksum = 0
-        computed_checksum = compute_checksum(pkt_header / msg)
-        
-        if original_checksum != computed_checksum:
-            # Corrupted packet, ignore
-            continue
-        
-        # Process different packet types
-        if pkt_header.type == 0:  # START
-            if not connection_active:
-                connection_active = True
-                expected_seq_num = 1
-                # Send ACK for START
-                ack_header = PacketHeader(type=3, seq_num=1, length=0)
-                ack_header.checksum = compute_checksum(ack_header / b'')
-                s.sendto(bytes(ack_header / b''), address)
-        
-        elif pkt_header.type == 1:  # END
-            if connection_active:
-                # Send ACK for END
-                ack_header = PacketHeader(type=3, seq_num=pkt_header.seq_num + 1, length=0)
-                ack_header.checksum = compute_checksum(ack_header / b'')
-                s.sendto(bytes(ack_header / b''), address)
-                # Exit the connection
+    try:
+        while True:
+            # Only block for as long as queued output or a held-back ACK may wait
+            timeouts = [t for conn in connections.values()
+                        for t in (conn.sink.flush_timeout(), conn.acks.timeout()) if t is not None]
+            if output_dir and connections:
+                timeouts.append(idle_timeout)
+            if linger_until is not None:
+                timeouts.append(max(linger_until - time.monotonic(), 0))
+            timeout = min(timeouts) if timeouts else None
+            ready = select.select([s], [], [], timeout)[0]
+            now = time.monotonic()
+            if linger_until is not None and now >= linger_until:
                 break
-        
-        elif pkt_header.type == 2 and connection_active:  # DATA
-            seq_num = pkt_header.seq_num
-            
-            # Drop packets outside the window
-            if seq_num >= expected_seq_num + window_size:
+            if output_dir:
+                # Drop connections that have gone quiet, finished or not
+                for address, conn in list(connections.items()):
+                    if now - conn.last_active >= idle_timeout:
+                        del connections[address]
+                        summaries.append(conn.summary())
+                        if not conn.finished:
+                            conn.close()
+                            print(f"Connection from {address[0]}:{address[1]} timed out", file=sys.stderr)
+                            if conn.transfer is not None and not conn.transfer.open_stripes:
+                                del transfers[conn.transfer.transfer_id]
+            if not ready:
+                for conn in connections.values():
+                    conn.sink.flush()
+                    if conn.acks.due():
+                        ack_view = ack_views[len(outgoing)]
+                        n = conn.pack_sack(ack_view)
+                        outgoing.queue((ack_view[:n],), conn.address)
+                        conn.acks.sent()
+                        conn.metrics.counters["acks_sent"] += 1
+                outgoing.flush()
                 continue
-                
-            # Send individual ACK for this packet
-            ack_header = PacketHeader(type=3, seq_num=seq_num, length=0)
-            ack_header.checksum = compute_checksum(ack_header / b'')
-            s.sendto(bytes(ack_header / b''), address)
-            
-            # Store the packet if not already processed
-            if seq_num >= expected_seq_num:
-                buffer[seq_num] = msg
             
-            # Process in-order packets
-            while expected_seq_num in buffer:
-                sys.stdout.buffer.write(buffer[expected_seq_num])
-                sys.stdout.flush()
-                del buffer[expected_seq_num]
-                expected_seq_num += 1
+            received = incoming.recv()
+            for pkt, address in received:
+                if len(pkt) < HEADER_SIZE:
+                    continue
+                
+                # Extract header and payload
+                pkt_type, seq_num, length, _ = unpack_header(pkt)
+                msg = pkt[HEADER_SIZE:HEADER_SIZE + length]
+                
+                conn = connections.get(address)
+                
+                # Verify checksum
+                if not verify_checksum(pkt):
+                    # Corrupted packet, ignore
+                    if conn is not None:
+                        conn.metrics.counters["checksum_failures"] += 1
+                    continue
+                
+                if conn is not None:
+                    conn.last_active = now
+                
+                # Process different packet types
+                if pkt_type == START:
+                    if conn is not None and not conn.finished:
+                        # The START ACK was lost; repeat it
+                        ack_view = ack_views[len(outgoing)]
+                        n = pack_into(ack_view, ACK, 1, encode_options(conn.accepted))
+                        outgoing.queue((ack_view[:n],), address)
+                        conn.metrics.counters["acks_sent"] += 1
+                        continue
+                    # Accept the requested extensions we support and echo them in the ACK
+                    options = decode_options(msg)
+                    sack_blocks = min(options.get(OPT_SACK, 0), max_sack_blocks)
+                    # OPT_SACK is echoed even when declined, as 0, so that the START ACK always
+                    # has a payload and a late copy cannot pass for the ACK of DATA packet 1
+                    accepted = {OPT_SACK: sack_blocks}
+                    payload_size = min(options.get(OPT_PAYLOAD) or MAX_PAYLOAD_SIZE, max_payload)
+                    if OPT_PAYLOAD in options:
+                        accepted[OPT_PAYLOAD] = payload_size
+                    if OPT_EARLY_DATA in options:
+                        accepted[OPT_EARLY_DATA] = 1
+                    resume_id = options.get(OPT_RESUME, 0)
+                    conn_window = window_size
+                    if max_buffer:
+                        conn_window = max(1, min(window_size, max_buffer // payload_size))
+                    fec_group = min(options.get(OPT_FEC_GROUP, 0), MAX_FEC_GROUP)
+                    fec = None
+                    if fec_group:
+                        fec_parity = min(max(options.get(OPT_FEC_PARITY, 1), 1), fec_group)
+                        accepted.update({OPT_FEC_GROUP: fec_group, OPT_FEC_PARITY: fec_parity})
+                        fec = FecDecoder(fec_group, fec_parity, payload_size)
+                    # Compressed stripes could not be written at their offsets
+                    compress = options.get(OPT_COMPRESS, 0)
+                    if compress in METHODS.values() and OPT_STRIPES not in options:
+                        accepted[OPT_COMPRESS] = compress
+                    else:
+                        compress = 0
+                    transfer = None
+                    if OPT_STRIPES in options and (output_dir or output_path):
+                        transfer = transfers.get(options.get(OPT_TRANSFER, 0))
+                        for option in (OPT_TRANSFER, OPT_STRIPES, OPT_OFFSET):
+                            accepted[option] = options.get(option, 0)
+                    elif OPT_STRIPES in options:
+                        # Stripes cannot be put back together on a stream; without the
+                        # option echoed, the sender gives up
+                        ack_view = ack_views[len(outgoing)]
+                        n = pack_into(ack_view, ACK, 1, encode_options(accepted))
+                        outgoing.queue((ack_view[:n],), address)
+                        continue
+                    if not output_dir and connections and transfer is None:
+                        current = next(iter(connections.values()))
+                        if not (resume_id and current.checkpoint is not None and not current.finished
+                                and current.checkpoint.transfer_id == resume_id):
+                            continue  # Only one transfer at a time without --output-dir
+                        # The sender restarted; save the old connection's progress and resume from it
+                        current.close()
+                        summaries.append(current.summary())
+                        del connections[current.address]
+                    # Out-of-order packets are buffered in memory for streams, or written in place to a file
+                    output = None
+                    checkpoint = None
+                    if OPT_STRIPES in accepted:
+                        if transfer is None:
+                            transfer_id = accepted[OPT_TRANSFER]
+                            path = os.path.join(output_dir, f"transfer_{transfer_id:016x}") if output_dir else output_path
+                            transfer = transfers[transfer_id] = StripedTransfer(transfer_id, path, accepted[OPT_STRIPES])
+                            if output_dir:
+                                print(f"Striped transfer {transfer_id:016x} writing to {path}", file=sys.stderr)
+                        sink = FileSink(transfer.path, conn_window, payload_size, accepted[OPT_OFFSET], transfer.fd)
+                    elif output_dir:
+                        accepted_count += 1
+                        path = os.path.join(output_dir, f"{address[0]}_{address[1]}_{accepted_count}")
+                        output = open(path, "wb")
+                        stream = DecompressingWriter(output, compress) if compress else output
+                        sink = StreamSink(stream, conn_window, payload_size,
+                                          flush_bytes, flush_packets, flush_interval)
+                        print(f"Connection from {address[0]}:{address[1]} writing to {path}", file=sys.stderr)
+                    elif output_path and not compress:
+                        offset = crc = 0
+                        if resume_id:
+                            offset, crc = resume_point(output_path, resume_id)
+                            accepted.update({OPT_RESUME: resume_id, OPT_RESUME_OFFSET: offset})
+                        sink = FileSink(output_path, conn_window, payload_size, offset)
+                        if resume_id:
+                            checkpoint = Checkpoint(output_path, resume_id, offset, crc)
+                    else:
+                        # Compressed data is decoded in order as it is written out, never in place
+                        output = open(output_path, "wb") if output_path else None
+                        stream = output or sys.stdout.buffer
+                        if compress:
+                            stream = DecompressingWriter(stream, compress)
+                        sink = StreamSink(stream, conn_window, payload_size,
+                                          flush_bytes, flush_packets, flush_interval)
+                    if OPT_SHORT_CHUNKS in options and isinstance(sink, StreamSink):
+                        # Only a FileSink places payloads by sequence number, which needs full chunks
+                        accepted[OPT_SHORT_CHUNKS] = 1
+                    acks = AckPolicy(ack_policy, ack_every, ack_delay, ack_on_gap)
+                    if conn is not None:
+                        summaries.append(conn.summary())  # Replaced by the sender's next transfer
+                    conn = connections[address] = Connection(address, sink, conn_window, sack_blocks, accepted,
+                                                             acks, output, transfer, fec, checkpoint)
+                    # Send ACK for START
+                    ack_view = ack_views[len(outgoing)]
+                    n = pack_into(ack_view, ACK, 1, encode_options(accepted))
+                    outgoing.queue((ack_view[:n],), address)
+                    held = early.pop(address, ())
+                    if held and OPT_EARLY_DATA in accepted:
+                        # Handle the DATA that overtook this START after it, as if it had just arrived
+                        conn.metrics.counters["early_data"] += len(held)
+                        received.extend((pkt, address) for pkt in held)
+                
+                elif pkt_type == PROBE:
+                    # Path MTU probe: report the payload length that arrived
+                    if length:
+                        ack_view = ack_views[len(outgoing)]
+                        n = pack_into(ack_view, PROBE, length)
+                        outgoing.queue((ack_view[:n],), address)
+                    
+                elif conn is None:
+                    if pkt_type == DATA:
+                        # Hold DATA sent right behind a START that is late or lost
+                        held = early.get(address)
+                        if held is None:
+                            if len(early) >= MAX_EARLY_SENDERS:
+                                del early[next(iter(early))]  # Forget the oldest sender
+                            held = early[address] = []
+                        if len(held) < window_size:
+                            held.append(bytes(pkt))  # Received datagrams are views into reused buffers
+                    continue
+                
+                elif pkt_type == END:
+                    if not conn.finished:
+                        conn.close(ended=True)
+                        if output_dir:
+                            print(f"Connection from {address[0]}:{address[1]} finished", file=sys.stderr)
+                        if conn.transfer is not None and not conn.transfer.open_stripes:
+                            del transfers[conn.transfer.transfer_id]
+                    # Send ACK for END, again if the first one was lost
+                    ack_view = ack_views[len(outgoing)]
+                    n = pack_into(ack_view, ACK, seq_num + 1)
+                    outgoing.queue((ack_view[:n],), address)
+                    conn.metrics.counters["acks_sent"] += 1
+                    if not output_dir and not transfers:
+                        # The connection, or the last stripe of the transfer, is over; stay
+                        # a little longer in case the END ACK is lost and END is resent
+                        linger_until = now + linger
+                
+                elif pkt_type == PARITY and conn.fec and not conn.finished:
+                    conn.metrics.counters["parity_received"] += 1
+                    rebuilt = conn.fec.add_parity(seq_num, msg)
+                    if rebuilt is None or not conn.recover(*rebuilt):
+                        continue
+                    conn.expected_seq_num = conn.sink.deliver(conn.expected_seq_num)
+                    conn.fec.discard_below(conn.expected_seq_num)
+                    if conn.checkpoint:
+                        conn.checkpoint.update(conn.sink.complete_bytes(conn.expected_seq_num))
+                    # The rebuilt packet filled a gap, so acknowledge it at once
+                    ack_view = ack_views[len(outgoing)]
+                    if conn.sack_blocks:
+                        n = conn.pack_sack(ack_view)
+                        conn.acks.sent()
+                    else:
+                        n = pack_into(ack_view, ACK, rebuilt[0])
+                    outgoing.queue((ack_view[:n],), address)
+                    conn.metrics.counters["acks_sent"] += 1
+                    
+                elif pkt_type == DATA and not conn.finished:
+                    expected_seq_num = conn.expected_seq_num
+                    
+                    counters = conn.metrics.counters
+                    counters["data_received"] += 1
+                    if events:
+                        events.event(EV_DATA, seq_num, seq_num - expected_seq_num)
+                    
+                    # Drop packets outside the window
+                    if seq_num >= expected_seq_num + conn.window_size:
+                        counters["out_of_window"] += 1
+                        if events:
+                            events.event(EV_DROP, seq_num)
+                        continue
+                        
+                    if not conn.sack_blocks:
+                        # Send individual ACK for this packet
+                        ack_view = ack_views[len(outgoing)]
+                        n = pack_into(ack_view, ACK, seq_num)
+                        outgoing.queue((ack_view[:n],), address)
+                        counters["acks_sent"] += 1
+                    
+                    # Store the packet if not already processed
+                    in_order = seq_num == expected_seq_num
+                    if seq_num < expected_seq_num:
+                        counters["duplicates"] += 1
+                    elif seq_num > expected_seq_num:
+                        conn.metrics.reorder.record(seq_num - expected_seq_num)
+                    if seq_num >= expected_seq_num:
+                        conn.sink.store(seq_num, msg)
+                        if conn.sack_blocks:
+                            conn.sack_ranges.add(seq_num)
+                        if conn.fec:
+                            rebuilt = conn.fec.add_data(seq_num, msg)
+                            if rebuilt and conn.recover(*rebuilt) and not conn.sack_blocks:
+                                ack_view = ack_views[len(outgoing)]
+                                n = pack_into(ack_view, ACK, rebuilt[0])
+                                outgoing.queue((ack_view[:n],), address)
+                                counters["acks_sent"] += 1
+                    
+                    # Process in-order packets
+                    expected_seq_num = conn.expected_seq_num = conn.sink.deliver(expected_seq_num)
+                    if conn.fec:
+                        conn.fec.discard_below(expected_seq_num)
+                    if conn.checkpoint:
+                        conn.checkpoint.update(conn.sink.complete_bytes(expected_seq_num))
+                    
+                    conn.latest_seq_num = seq_num
+                    
+                    # One SACK acknowledges everything received so far, so it can be held
+                    # back; it goes out at once if the packet was out of order or filled a gap
+                    if conn.sack_blocks and conn.acks.on_data(in_order and expected_seq_num == seq_num + 1):
+                        ack_view = ack_views[len(outgoing)]
+                        n = conn.pack_sack(ack_view)
+                        outgoing.queue((ack_view[:n],), address)
+                        conn.acks.sent()
+                        counters["acks_sent"] += 1
+            outgoing.flush()
+    finally:
+        # Keep what arrived of unfinished transfers when interrupted
+        for conn in connections.values():
+            if not conn.finished:
+                conn.close()
+            summaries.append(conn.summary())
+        if events:
+            events.close()
+        if metrics_path:
+            write_summary({"connections": summaries}, metrics_path)
+
+async def receive_async(receiver_ip, receiver_port, window_size, output, max_sack_blocks=MAX_SACK_BLOCKS):
+    """Receive one transfer with the asyncio server in aio.py and write it to ``output``."""
+    server = await aio.start_server(receiver_ip, receiver_port, window_size, max_sack_blocks=max_sack_blocks)
+    async with server:
+        connection = await server.accept()
+        async for data in connection:
+            output.write(data)
+    output.flush()
 
 def main():
     parser = argparse.ArgumentParser()
@@ -83,9 +470,116 @@ def main():
     parser.add_argument(
         "window_size", type=int, help="Maximum number of outstanding packets"
     )
+    parser.add_argument(
+        "--output", help="Write the message to this file instead of stdout"
+    )
+    parser.add_argument(
+        "--flush-bytes", type=int, default=DEFAULT_FLUSH_BYTES,
+        help="Write stdout output once this many in-order bytes are queued (0 disables)"
+    )
+    parser.add_argument(
+        "--flush-packets", type=int, default=0,
+        help="Write stdout output once this many in-order packets are queued (0 disables)"
+    )
+    parser.add_argument(
+        "--flush-interval", type=float, default=DEFAULT_FLUSH_INTERVAL,
+        help="Write stdout output once it has been queued this many seconds (0 disables)"
+    )
+    parser.add_argument(
+        "--sack-blocks", type=int, default=MAX_SACK_BLOCKS,
+        help="Most SACK blocks to send per ACK if the sender asks for them (0 disables SACK)"
+    )
+    parser.add_argument(
+        "--ack-policy", choices=POLICIES, default=IMMEDIATE,
+        help="When to acknowledge in-order DATA packets with SACK; individual ACKs are always immediate"
+    )
+    parser.add_argument(
+        "--ack-every", type=int, default=DEFAULT_ACK_EVERY,
+        help="Packets covered by one ACK under the 'every' policy"
+    )
+    parser.add_argument(
+        "--ack-delay", type=float, default=DEFAULT_ACK_DELAY,
+        help="Seconds an ACK may be held back under the 'every' and 'delayed' policies"
+    )
+    parser.add_argument(
+        "--no-ack-on-gap", dest="ack_on_gap", action="store_false",
+        help="Do not acknowledge out-of-order packets immediately"
+    )
+    parser.add_argument(
+        "--batch", type=int, default=DEFAULT_BATCH,
+        help="Most datagrams received or sent per system call"
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="Serve concurrent senders until interrupted, writing each stream to its own file in this directory"
+    )
+    parser.add_argument(
+        "--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+        help="With --output-dir, drop a connection after this many seconds without a packet"
+    )
+    parser.add_argument(
+        "--metrics", help="Write a JSON summary of each connection's counters and histograms to this file ('-' for stderr)"
+    )
+    parser.add_argument(
+        "--trace-events", help="Write a binary trace of DATA packet events to this file (see metrics.read_trace)"
+    )
+    parser.add_argument(
+        "--trace-sample", type=int, default=1, help="Trace only every Nth event"
+    )
+    parser.add_argument(
+        "--max-payload", type=int, default=MAX_PAYLOAD_SIZE,
+        help=f"Largest DATA payload senders may negotiate, up to {MAX_PAYLOAD_LIMIT} bytes"
+    )
+    parser.add_argument(
+        "--linger", type=float, default=DEFAULT_LINGER,
+        help="Without --output-dir, seconds to keep acknowledging repeated ENDs before exiting"
+    )
+    parser.add_argument(
+        "--max-buffer", type=int, default=0,
+        help="Most bytes each connection may buffer (0 allows a full window)"
+    )
+    parser.add_argument(
+        "--asyncio", action="store_true",
+        help="Receive with the asyncio server in aio.py (only with --output and --sack-blocks)"
+    )
     args = parser.parse_args()
+    if not MAX_PAYLOAD_SIZE <= args.max_payload <= MAX_PAYLOAD_LIMIT:
+        parser.error(f"--max-payload must be between {MAX_PAYLOAD_SIZE} and {MAX_PAYLOAD_LIMIT}")
+    if not 0 <= args.sack_blocks <= SACK_BLOCK_LIMIT:
+        # An ACK with more blocks would not fit in one packet
+        parser.error(f"--sack-blocks must be between 0 and {SACK_BLOCK_LIMIT}")
+
+    if args.asyncio:
+        # aio.py acknowledges every packet at once and hands one transfer's data to a stream
+        unsupported = [name for name, used in (
+            ("--output-dir", args.output_dir), ("--idle-timeout", args.idle_timeout != DEFAULT_IDLE_TIMEOUT),
+            ("--max-payload", args.max_payload != MAX_PAYLOAD_SIZE), ("--max-buffer", args.max_buffer),
+            ("--ack-policy", args.ack_policy != IMMEDIATE), ("--ack-every", args.ack_every != DEFAULT_ACK_EVERY),
+            ("--ack-delay", args.ack_delay != DEFAULT_ACK_DELAY), ("--no-ack-on-gap", not args.ack_on_gap),
+            ("--flush-bytes", args.flush_bytes != DEFAULT_FLUSH_BYTES), ("--flush-packets", args.flush_packets),
+            ("--flush-interval", args.flush_interval != DEFAULT_FLUSH_INTERVAL),
+            ("--batch", args.batch != DEFAULT_BATCH), ("--metrics", args.metrics),
+            ("--trace-events", args.trace_events), ("--trace-sample", args.trace_sample != 1),
+            ("--linger", args.linger != DEFAULT_LINGER),
+        ) if used]
+        if unsupported:
+            parser.error(f"--asyncio cannot be combined with {', '.join(unsupported)}")
+        output = open(args.output, "wb") if args.output else sys.stdout.buffer
+        with output:
+            asyncio.run(receive_async(args.receiver_ip, args.receiver_port, args.window_size, output,
+                                      args.sack_blocks))
+        return
 
-    receiver(args.receiver_ip, args.receiver_port, args.window_size)
+    # Close connections and write metrics on SIGTERM as well as on Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        receiver(args.receiver_ip, args.receiver_port, args.window_size, args.output,
+                 args.flush_bytes, args.flush_packets, args.flush_interval, args.sack_blocks,
+                 args.ack_policy, args.ack_every, args.ack_delay, args.ack_on_gap, args.batch,
+                 args.output_dir, args.idle_timeout, args.max_buffer,
+                 args.metrics, args.trace_events, args.trace_sample, args.max_payload, args.linger)
+    except KeyboardInterrupt:
+        pass
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
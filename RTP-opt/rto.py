@@ -0,0 +1,37 @@
+"""Retransmission timeout estimation (Jacobson/Karels, as in RFC 6298)."""
+
+INITIAL_RTO = 0.5  # Seconds; the fixed timer the senders used to have
+MIN_RTO = 0.02
+MAX_RTO = 2.0
+
+ALPHA = 1 / 8  # Gain for the smoothed RTT
+BETA = 1 / 4  # Gain for the RTT variation
+K = 4
+
+
+class RttEstimator:
+    """Tracks SRTT and RTTVAR from RTT samples and derives the RTO.
+
+    Callers must only feed samples from packets that were sent once (Karn's
+    rule). ``backoff()`` doubles the RTO after a timeout; the next valid
+    sample recomputes it from the estimates again.
+    """
+
+    def __init__(self, initial_rto=INITIAL_RTO, min_rto=MIN_RTO, max_rto=MAX_RTO):
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.srtt = None
+        self.rttvar = None
+        self.rto = min(max(initial_rto, min_rto), max_rto)
+
+    def sample(self, rtt):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - ALPHA) * self.srtt + ALPHA * rtt
+        self.rto = min(max(self.srtt + K * self.rttvar, self.min_rto), self.max_rto)
+
+    def backoff(self):
+        self.rto = min(self.rto * 2, self.max_rto)
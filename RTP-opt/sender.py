@@ -1,126 +1,374 @@
 import argparse
+import asyncio
+import multiprocessing
+import os
 import socket
 import sys
 import time
 import select
-from utils import PacketHeader, compute_checksum
+import struct
+from codec import (
+    START, ACK, SACK, PARITY, HEADER_SIZE, MAX_PAYLOAD_LIMIT, MAX_PAYLOAD_SIZE, OPT_COMPRESS, OPT_EARLY_DATA,
+    OPT_FEC_GROUP, OPT_FEC_PARITY, OPT_OFFSET, OPT_PAYLOAD, OPT_RESUME, OPT_RESUME_OFFSET, OPT_SACK, OPT_SHORT_CHUNKS,
+    OPT_STRIPES, OPT_TRANSFER, decode_sack_blocks, encode_options, make_header, make_packet, unpack_header,
+)
+import aio
+from batchio import DEFAULT_BATCH, RecvBatch, SendBatch
+from checkpoint import file_transfer_id
+from compress import LEVELS, METHODS, CompressingReader
+from congestion import ALGORITHMS, DEFAULT_ALGORITHM, CwndTrace
+from fec import FecEncoder
+from handshake import send_end, wait_for_start_ack
+from metrics import EV_ACK, EV_RETRANSMIT, EV_SEND, EV_TIMEOUT, SENDER_COUNTERS, EventTrace, Metrics, write_summary
+from pacing import Pacer
+from pmtu import probe_payload_size
+from rto import RttEstimator
+from stream import ChunkReader, open_input
+from timers import TimerHeap
+from utils import verify_checksum
+from window import SendWindow
 
-def sender(receiver_ip, receiver_port, window_size):
+DUP_ACK_THRESHOLD = 3  # Later packets SACKed before a hole is resent ahead of its timer
+
+def sender(receiver_ip, receiver_port, window_size, input_path=None, sack_blocks=0,
+           congestion=DEFAULT_ALGORITHM, cwnd_trace=None, pacing=False, pace_rate=None,
+           batch_size=DEFAULT_BATCH, stripe=None, metrics_path=None, event_trace=None, trace_sample=1,
+           fec_group=0, fec_parity=1, compress=None, compress_level="fast", payload_size=MAX_PAYLOAD_SIZE,
+           probe_mtu=False, early_data=False, resume=False):
     # Create UDP socket
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     
     # Initialize variables
     seq_num = 0
-    window = {}  # Maps sequence numbers to (packet, sent_time, acked)
+    window = SendWindow(window_size)  # State of the packets in [base, next_seq_num)
     next_seq_num = 0
     base = 0  # Base of the window
     
-    # Read data from stdin
-    data = sys.stdin.buffer.read()
-    chunk_size = 1456  # 1472 - 16 bytes for header
-    chunks = [data[i:i+chunk_size] for i in range(0, len(data), chunk_size)]
-    
-    # Send START packet
-    start_header = PacketHeader(type=0, seq_num=seq_num, length=0)
-    start_header.checksum = compute_checksum(start_header / b'')
-    start_packet = bytes(start_header / b'')
-    s.sendto(start_packet, (receiver_ip, receiver_port))
-    
-    # Wait for START ACK
-    s.settimeout(1)
-    try:
-        pkt, _ = s.recvfrom(1472)
-        ack_header = PacketHeader(pkt[:16])
-        if ack_header.type != 3 or ack_header.seq_num != 1:
-            print("Did not receive proper START ACK")
-            return
-    except socket.timeout:
-        print("Timeout waiting for START ACK")
-        return
+    address = (receiver_ip, receiver_port)
     
-    # Set non-blocking mode for socket
-    s.setblocking(False)
+    offset, stripe_length = 0, None
+    if stripe:
+        # Only this stripe's byte range of the file
+        transfer_id, stripes, offset, stripe_length = stripe
+    
+    if probe_mtu:
+        # Ask for no more than the largest payload that arrives unfragmented
+        payload_size = probe_payload_size(s, address, payload_size) or payload_size
+    
+    # Early DATA is cut into packets before the receiver answers, so only
+    # transfers whose packets nothing in the START ACK can change send it
+    early_data = early_data and not (compress or fec_group or resume) and payload_size == MAX_PAYLOAD_SIZE
+    
+    # Send START packet, asking for SACK blocks if enabled
+    options = {OPT_SACK: sack_blocks} if sack_blocks else {}
+    if payload_size != MAX_PAYLOAD_SIZE:
+        options[OPT_PAYLOAD] = payload_size
+    if stripe:
+        options.update({OPT_TRANSFER: transfer_id, OPT_STRIPES: stripes, OPT_OFFSET: offset})
+    if fec_group:
+        options.update({OPT_FEC_GROUP: fec_group, OPT_FEC_PARITY: fec_parity})
+    if compress:
+        options[OPT_COMPRESS] = METHODS[compress]
+    if early_data:
+        options[OPT_EARLY_DATA] = 1
+    if resume:
+        # The receiver keeps a checkpoint of how much of this file it has
+        options[OPT_RESUME] = file_transfer_id(input_path)
+    if not input_path:
+        # Send stdin as it arrives, in short chunks if the receiver takes them
+        options[OPT_SHORT_CHUNKS] = 1
+    start_packet = make_packet(START, seq_num, encode_options(options))
+    s.sendto(start_packet, address)
+    start_time = time.monotonic()
     
     # Initialize sequence number
     seq_num = 1
     base = 1
     next_seq_num = 1
-    timer_start = None
-    
-    # Send data
-    while base < len(chunks) + 1:
-        # Send new packets if window allows
-        while next_seq_num < base + window_size and next_seq_num < len(chunks) + 1:
-            data_header = PacketHeader(type=2, seq_num=next_seq_num, length=len(chunks[next_seq_num-1]))
-            data_header.checksum = compute_checksum(data_header / chunks[next_seq_num-1])
-            data_packet = bytes(data_header / chunks[next_seq_num-1])
-            s.sendto(data_packet, (receiver_ip, receiver_port))
-            window[next_seq_num] = (data_packet, time.time(), False)  # Not acked yet
-            if timer_start is None:
-                timer_start = time.time()
+    rtt = RttEstimator()
+    timers = TimerHeap()  # One retransmission deadline per unacked packet
+    trace = CwndTrace(cwnd_trace) if cwnd_trace else None
+    cc = ALGORITHMS[congestion](window_size, trace)
+    pacer = Pacer(pace_rate) if pacing or pace_rate else None
+    metrics = Metrics(SENDER_COUNTERS)
+    stats = metrics.counters
+    events = EventTrace(event_trace, trace_sample) if event_trace else None
+    
+    reader = None
+    if early_data:
+        # The first window of DATA follows START without waiting for its ACK
+        reader = open_input(input_path, MAX_PAYLOAD_SIZE, window_size, offset, stripe_length)
+        outgoing = SendBatch(s, batch_size)
+        now = time.monotonic()
+        while next_seq_num < base + cc.window:
+            chunk = reader.read(next_seq_num)
+            if chunk is None:
+                break
+            outgoing.queue(window.add(next_seq_num, chunk, now), address)
+            stats["data_sent"] += 1
+            if events:
+                events.event(EV_SEND, next_seq_num, len(chunk))
+            timers.schedule(next_seq_num, now + rtt.rto)
+            next_seq_num += 1
+        outgoing.flush()
+    
+    # Wait for START ACK, resending START with backoff
+    accepted, start_rtt = wait_for_start_ack(s, address, start_packet, start_time, early_data)
+    if accepted is None:
+        print("Timeout waiting for START ACK")
+        return
+    if start_rtt is not None:
+        rtt.sample(start_rtt)
+        metrics.rtt.record(start_rtt)
+    else:
+        # Early DATA waited at the receiver for the resent START; Karn's rule applies
+        for seq in range(1, next_seq_num):
+            window.mark_retransmitted(seq)
+    # The receiver echoes the options it accepted; an older receiver echoes none
+    if not accepted.get(OPT_SACK, 0):
+        sack_blocks = 0
+    if stripe and OPT_STRIPES not in accepted:
+        print("Receiver does not accept striped transfers")
+        return
+    # The receiver may lower the payload size; one without OPT_PAYLOAD takes the default
+    chunk_size = accepted.get(OPT_PAYLOAD, MAX_PAYLOAD_SIZE)
+    # The receiver may shrink the FEC groups, or decline FEC
+    fec_group = accepted.get(OPT_FEC_GROUP, 0)
+    fec = FecEncoder(fec_group, accepted.get(OPT_FEC_PARITY, 1), chunk_size) if fec_group else None
+    compress_method = accepted.get(OPT_COMPRESS, 0)
+    if accepted.get(OPT_RESUME_OFFSET):
+        # Skip what an earlier attempt delivered
+        offset = accepted[OPT_RESUME_OFFSET]
+        print(f"Resuming after {offset} bytes")
+    
+    # Map the input file, or read stdin lazily so that only chunks inside the
+    # send window are kept in memory
+    compressor = None
+    if compress_method:
+        # Compress the input block by block ahead of packetization
+        source = open(input_path, "rb") if input_path else sys.stdin.buffer
+        compressor = CompressingReader(source, compress_method, LEVELS[compress_method][compress_level])
+        reader = ChunkReader(compressor, chunk_size, window_size)
+    elif reader is None:
+        reader = open_input(input_path, chunk_size, window_size, offset, stripe_length)
+    if OPT_SHORT_CHUNKS in accepted:
+        reader.short_chunks = True
+    
+    # Set non-blocking mode for socket
+    s.setblocking(False)
+    # Drain every ready ACK per wakeup, and send DATA in batches
+    incoming = RecvBatch(s, batch_size)
+    outgoing = SendBatch(s, batch_size, HEADER_SIZE + chunk_size)
+    if chunk_size > MAX_PAYLOAD_SIZE:
+        # Room for a window of large packets
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, window_size * (HEADER_SIZE + chunk_size))
+    
+    if early_data and OPT_EARLY_DATA not in accepted:
+        # The receiver does not hold early DATA and may have dropped it; resend it
+        now = time.monotonic()
+        for seq in range(1, next_seq_num):
+            outgoing.queue(window.packet(seq), address)
+            window.mark_retransmitted(seq)
+            stats["retransmits"] += 1
+            if events:
+                events.event(EV_RETRANSMIT, seq)
+            timers.schedule(seq, now + rtt.rto)
+    
+    # Leave holes that a group's parity may still rebuild to the parity
+    reorder_threshold = max(DUP_ACK_THRESHOLD, fec_group)
+    recover_seq = 0  # Timers of packets below this that expire belong to the last timeout
+    recover_deadline = 0.0  # When the retransmissions made at the last timeout expire
+    
+    # Send data until stdin is exhausted and everything read has been acknowledged
+    while not (reader.eof and base == next_seq_num):
+        # Send new packets if the congestion window allows, spaced out by the pacer
+        pacing_delay = 0.0
+        starved = False  # The window has room, but stdin has no input ready
+        while next_seq_num < base + cc.window:
+            if pacer:
+                pacing_delay = pacer.wait()
+                if pacing_delay:
+                    break
+            chunk = reader.read(next_seq_num)
+            if chunk is None:
+                starved = reader.waiting
+                break
+            now = time.monotonic()
+            outgoing.queue(window.add(next_seq_num, chunk, now), address)
+            stats["data_sent"] += 1
+            if events:
+                events.event(EV_SEND, next_seq_num, len(chunk))
+            if fec:
+                # The group's parity follows its last packet
+                for parity_seq, parity in fec.add(next_seq_num, chunk):
+                    outgoing.queue((make_header(PARITY, parity_seq, parity), parity), address)
+                    stats["parity_sent"] += 1
+            if pacer:
+                # Paced packets leave one at a time
+                outgoing.flush()
+                pacer.sent(now, pacer.interval(cc.cwnd, rtt.srtt))
+            timers.schedule(next_seq_num, now + rtt.rto)
             next_seq_num += 1
         
+        outgoing.flush()
+        
         # Check for ACKs
         try:
-            ready = select.select([s], [], [], 0.1)
-            if ready[0]:
-                pkt, _ = s.recvfrom(1472)
-                ack_header = PacketHeader(pkt[:16])
-                if ack_header.type == 3:
-                    # Process individual ACK
-                    acked_seq = ack_header.seq_num
-                    if acked_seq in window:
-                        packet, sent_time, _ = window[acked_seq]
-                        window[acked_seq] = (packet, sent_time, True)  # Mark as acked
-                    
-                    # Update base (smallest unacked packet)
-                    while base in window and window[base][2]:  # If base is acked
-                        del window[base]
-                        base += 1
+            # Sleep until the earliest retransmission deadline at the latest
+            timer_deadline = timers.next_deadline()
+            timeout = max(timer_deadline - time.monotonic(), 0) if timer_deadline is not None else 0
+            if pacing_delay:
+                # ...or until the pacer releases the next packet
+                timeout = min(timeout, pacing_delay) if timer_deadline is not None else pacing_delay
+            elif starved and timer_deadline is None:
+                timeout = None  # Nothing in flight to time out
+            # ...or until stdin has more input for the window
+            ready = select.select([s, sys.stdin.buffer] if starved else [s], [], [], timeout)
+            if s in ready[0]:
+                for pkt, _ in incoming.recv():
+                    if len(pkt) < HEADER_SIZE:
+                        continue
+                    ack_type, ack_seq, length, _ = unpack_header(pkt)
+                    if not verify_checksum(pkt):
+                        # Corrupted ACK, ignore
+                        stats["checksum_failures"] += 1
+                        continue
+                    stats["acks"] += 1
+                    if events:
+                        events.event(EV_ACK, ack_seq)
+                    if ack_type == ACK and (length or sack_blocks):
+                        # A repeated START ACK, which carries options, or a plain ACK in SACK
+                        # mode, where only the START ACK is one: neither acknowledges DATA 1
+                        stats["dup_acks"] += 1
+                    elif ack_type == ACK:
+                        # Process individual ACK
+                        if base <= ack_seq < next_seq_num and not window.is_acked(ack_seq):
+                            # Karn's rule: no RTT samples from retransmitted packets
+                            now = time.monotonic()
+                            sent_time = window.sent_time(ack_seq)
+                            if sent_time is not None:
+                                rtt.sample(now - sent_time)
+                                metrics.rtt.record(now - sent_time)
+                            window.mark_acked(ack_seq)
+                            timers.cancel(ack_seq)
+                            cc.on_ack(1, now)
+                        else:
+                            stats["dup_acks"] += 1
                     
-                    # Reset timer if window moved
-                    if window:
-                        # Only restart timer if there are unacked packets
-                        unacked = False
-                        for _, _, acked in window.values():
-                            if not acked:
-                                unacked = True
-                                break
-                        if unacked:
-                            timer_start = time.time()
+                        # Update base (smallest unacked packet)
+                        while base < next_seq_num and window.is_acked(base):
+                            base += 1
+                    elif ack_type == SACK and sack_blocks:
+                        # Cumulative ACK up to ack_seq plus selectively acknowledged blocks
+                        blocks = decode_sack_blocks(pkt[HEADER_SIZE:])
+                        blocks.append((base, ack_seq))
+                        newly_acked = window.mark_sacked(blocks, base, next_seq_num)
+                        if newly_acked:
+                            now = time.monotonic()
+                            for seq in newly_acked:
+                                timers.cancel(seq)
+                            # Karn's rule: sample the newest packet, unless a retransmission
+                            # is among those acknowledged
+                            if not window.any_retransmitted(newly_acked):
+                                sent_time = window.sent_time(max(newly_acked))
+                                rtt.sample(now - sent_time)
+                                metrics.rtt.record(now - sent_time)
+                            cc.on_ack(len(newly_acked), now)
+                            base = window.advance(base, next_seq_num)
+                            # Resend holes that reorder_threshold later packets have
+                            # overtaken, once each; anything lost again waits for its timer
+                            highest = min(max(end for _, end in blocks), next_seq_num)
+                            for seq in window.unacked(base, highest - reorder_threshold):
+                                if window.sent_time(seq) is not None:
+                                    outgoing.queue(window.packet(seq), address)
+                                    window.mark_retransmitted(seq)
+                                    stats["retransmits"] += 1
+                                    if events:
+                                        events.event(EV_RETRANSMIT, seq)
+                                    timers.schedule(seq, now + rtt.rto)
+                                    cc.on_loss(seq, next_seq_num, now)
                         else:
-                            timer_start = None
-                    else:
-                        timer_start = None
-        except (socket.error, BlockingIOError):
+                            stats["dup_acks"] += 1
+        except (socket.error, BlockingIOError, struct.error):
             pass
         
-        # Check for timeout
-        if timer_start is not None and time.time() - timer_start > 0.5:
-            # Retransmit only unacked packets in window
-            for seq, (packet, _, acked) in window.items():
-                if not acked:
-                    s.sendto(packet, (receiver_ip, receiver_port))
-            timer_start = time.time()
-    
-    # Send END packet
-    end_header = PacketHeader(type=1, seq_num=seq_num, length=0)
-    end_header.checksum = compute_checksum(end_header / b'')
-    end_packet = bytes(end_header / b'')
-    s.sendto(end_packet, (receiver_ip, receiver_port))
-    
-    # Wait for END ACK with 500ms timeout
-    end_time = time.time() + 0.5
-    while time.time() < end_time:
-        try:
-            ready = select.select([s], [], [], end_time - time.time())
-            if ready[0]:
-                pkt, _ = s.recvfrom(1472)
-                ack_header = PacketHeader(pkt[:16])
-                if ack_header.type == 3 and ack_header.seq_num == seq_num + 1:
-                    break  # Received END ACK
-        except (socket.error, BlockingIOError):
-            pass
+        # Retransmit only the packets whose own timer has expired
+        now = time.monotonic()
+        expired = timers.pop_expired(now)
+        if expired:
+            stats["timeouts"] += 1
+            if events:
+                events.event(EV_TIMEOUT, base)
+            # The timers of one flight expire microseconds apart: back off once
+            # per loss event, and again only if its retransmissions time out too
+            if max(expired) >= recover_seq or now >= recover_deadline:
+                rtt.backoff()
+                recover_seq = next_seq_num
+                recover_deadline = now + rtt.rto
+            cc.on_timeout(max(expired), next_seq_num, now)
+            for seq in expired:
+                outgoing.queue(window.packet(seq), address)
+                window.mark_retransmitted(seq)
+                stats["retransmits"] += 1
+                if events:
+                    events.event(EV_RETRANSMIT, seq)
+                timers.schedule(seq, now + rtt.rto)
+    
+    outgoing.flush()
+    if trace:
+        trace.close()
+    if events:
+        events.close()
+    print(f"Sent {reader.bytes_read} bytes in {next_seq_num - 1} chunks.")
+    print(f"Timeouts: {stats['timeouts']}, retransmitted packets: {stats['retransmits']}")
+    if pacer:
+        stats["pacing_waits"] = pacer.waits
+        print(f"Paced packets: {pacer.waits}, pacing delay: {pacer.wait_time:.3f}s")
+    if fec:
+        print(f"FEC parity packets: {stats['parity_sent']}")
+    if compressor:
+        print(f"Compressed {compressor.bytes_in} bytes into {compressor.bytes_out} "
+              f"({compressor.raw_blocks} blocks sent raw).")
+    if metrics_path:
+        write_summary(metrics.summary(), metrics_path)
+    
+    # Send END until it is acknowledged
+    if not send_end(s, address, next_seq_num, rtt.rto):
+        print("No ACK for END")
+    
+    return stats
+
+def send_striped(receiver_ip, receiver_port, window_size, input_path, stripes, **options):
+    """Send ``input_path`` as ``stripes`` byte ranges in parallel, each from its own process and socket.
+
+    Every stripe is a complete transfer made by sender(), which gets
+    ``options`` as keyword arguments; the receiver writes each stripe at its
+    offset in one output file. Returns the stripes' stats, or None if one failed.
+    """
+    size = os.path.getsize(input_path)
+    # Whole chunks per stripe, so only the last packet of each stripe can be short
+    payload_size = options.get("payload_size", MAX_PAYLOAD_SIZE)
+    chunks = -(-size // payload_size)
+    stripe_size = max(1, -(-chunks // stripes)) * payload_size
+    offsets = list(range(0, size, stripe_size)) or [0]
+    transfer_id = int.from_bytes(os.urandom(8), "big")
+    # Each stripe writes its own trace and metrics files
+    outputs = {name: options.pop(name, None) for name in ("cwnd_trace", "metrics_path", "event_trace")}
+    
+    start = time.monotonic()
+    with multiprocessing.Pool(len(offsets)) as pool:
+        results = [pool.apply_async(sender, (receiver_ip, receiver_port, window_size, input_path),
+                                    dict(options, stripe=(transfer_id, len(offsets), offset, stripe_size),
+                                         **{name: f"{path}.{i}" if path else None for name, path in outputs.items()}))
+                   for i, offset in enumerate(offsets)]
+        stats = [result.get() for result in results]
+    elapsed = time.monotonic() - start
+    
+    if None in stats:
+        print("Striped transfer failed")
+        return None
+    print(f"Sent {size} bytes in {len(offsets)} stripes in {elapsed:.3f}s ({size / elapsed / 1e6:.1f} MB/s).")
+    return stats
 
 def main():
     parser = argparse.ArgumentParser()
@@ -133,9 +381,131 @@ def main():
     parser.add_argument(
         "window_size", type=int, help="Maximum number of outstanding packets"
     )
+    parser.add_argument(
+        "--input", help="Send this file (memory-mapped) instead of stdin"
+    )
+    parser.add_argument(
+        "--sack-blocks", type=int, default=0,
+        help="Ask the receiver for up to this many SACK blocks per ACK (0 disables SACK)"
+    )
+    parser.add_argument(
+        "--congestion", choices=sorted(ALGORITHMS), default=DEFAULT_ALGORITHM,
+        help="Congestion control algorithm; 'none' always keeps window_size packets in flight"
+    )
+    parser.add_argument(
+        "--cwnd-trace", help="Write every congestion window change to this CSV file"
+    )
+    parser.add_argument(
+        "--pacing", action="store_true",
+        help="Space DATA packets out at the congestion window's rate (cwnd / SRTT)"
+    )
+    parser.add_argument(
+        "--pace-rate", type=float,
+        help="Space DATA packets out at this fixed rate, in packets per second"
+    )
+    parser.add_argument(
+        "--batch", type=int, default=DEFAULT_BATCH,
+        help="Most datagrams sent or received per system call"
+    )
+    parser.add_argument(
+        "--asyncio", action="store_true",
+        help="Send with the asyncio transport in aio.py (only with --input, --sack-blocks and --congestion)"
+    )
+    parser.add_argument(
+        "--metrics", help="Write a JSON summary of counters and histograms to this file ('-' for stderr)"
+    )
+    parser.add_argument(
+        "--trace-events", help="Write a binary trace of packet events to this file (see metrics.read_trace)"
+    )
+    parser.add_argument(
+        "--trace-sample", type=int, default=1, help="Trace only every Nth event"
+    )
+    parser.add_argument(
+        "--fec-group", type=int, default=0,
+        help="Send PARITY packets over groups of this many DATA packets (0 disables FEC)"
+    )
+    parser.add_argument(
+        "--fec-parity", type=int, default=1,
+        help="PARITY packets per FEC group; N of them can rebuild a burst of N losses"
+    )
+    parser.add_argument(
+        "--compress", choices=sorted(METHODS),
+        help="Compress the data with this method if the receiver supports it"
+    )
+    parser.add_argument(
+        "--compress-level", choices=("fast", "dense"), default="fast",
+        help="Trade compression ratio for CPU time"
+    )
+    parser.add_argument(
+        "--payload-size", type=int, default=MAX_PAYLOAD_SIZE,
+        help=f"DATA payload size in bytes, up to {MAX_PAYLOAD_LIMIT}; the receiver may lower it"
+    )
+    parser.add_argument(
+        "--probe-mtu", action="store_true",
+        help="Lower --payload-size to the largest payload that reaches the receiver unfragmented"
+    )
+    parser.add_argument(
+        "--early-data", action="store_true",
+        help="Send the first window of DATA right behind START (not with --compress, --fec-group or a larger payload)"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Continue an interrupted transfer of --input from the receiver's checkpoint"
+    )
+    parser.add_argument(
+        "--stripes", type=int, default=1,
+        help="Split --input into this many byte ranges, sent in parallel by as many processes"
+    )
     args = parser.parse_args()
+    if args.fec_group and not 1 <= args.fec_parity <= args.fec_group:
+        parser.error("--fec-parity must be between 1 and --fec-group")
+    if args.resume and not args.input:
+        parser.error("--resume needs --input")
+    if args.resume and args.compress:
+        parser.error("--resume cannot be combined with --compress")
+    if not 1 <= args.payload_size <= MAX_PAYLOAD_LIMIT:
+        parser.error(f"--payload-size must be between 1 and {MAX_PAYLOAD_LIMIT}")
+
+    if args.asyncio:
+        # aio.py sends default-sized DATA as it comes, with none of the select loop's extensions
+        unsupported = [name for name, used in (
+            ("--pacing", args.pacing), ("--pace-rate", args.pace_rate), ("--cwnd-trace", args.cwnd_trace),
+            ("--metrics", args.metrics), ("--trace-events", args.trace_events), ("--fec-group", args.fec_group),
+            ("--compress", args.compress), ("--payload-size", args.payload_size != MAX_PAYLOAD_SIZE),
+            ("--probe-mtu", args.probe_mtu), ("--early-data", args.early_data), ("--resume", args.resume),
+            ("--stripes", args.stripes > 1),
+        ) if used]
+        if unsupported:
+            parser.error(f"--asyncio cannot be combined with {', '.join(unsupported)}")
+        stream = open(args.input, "rb") if args.input else sys.stdin.buffer
+        try:
+            sent = asyncio.run(aio.send(stream, (args.receiver_ip, args.receiver_port), args.window_size,
+                                        sack_blocks=args.sack_blocks, congestion=args.congestion))
+        except TimeoutError as e:
+            print(e)
+            return
+        print(f"Sent {sent} bytes.")
+        return
+
+    if args.stripes > 1:
+        if not args.input:
+            parser.error("--stripes needs --input")
+        if args.compress or args.resume:
+            parser.error("--stripes cannot be combined with --compress or --resume")
+        send_striped(args.receiver_ip, args.receiver_port, args.window_size, args.input, args.stripes,
+                     sack_blocks=args.sack_blocks, congestion=args.congestion, cwnd_trace=args.cwnd_trace,
+                     pacing=args.pacing, pace_rate=args.pace_rate, batch_size=args.batch,
+                     metrics_path=args.metrics, event_trace=args.trace_events, trace_sample=args.trace_sample,
+                     fec_group=args.fec_group, fec_parity=args.fec_parity, payload_size=args.payload_size,
+                     probe_mtu=args.probe_mtu, early_data=args.early_data)
+        return
 
-    sender(args.receiver_ip, args.receiver_port, args.window_size)
+    sender(args.receiver_ip, args.receiver_port, args.window_size, args.input, args.sack_blocks,
+           args.congestion, args.cwnd_trace, args.pacing, args.pace_rate,
+           args.batch, metrics_path=args.metrics, event_trace=args.trace_events, trace_sample=args.trace_sample,
+           fec_group=args.fec_group, fec_parity=args.fec_parity, compress=args.compress,
+           compress_level=args.compress_level, payload_size=args.payload_size, probe_mtu=args.probe_mtu,
+           early_data=args.early_data, resume=args.resume)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""Per-packet retransmission timers."""
+import heapq
+
+
+class TimerHeap:
+    """Retransmission deadlines keyed by sequence number, kept in a min-heap.
+
+    Cancelling or rescheduling only updates a dict; the superseded heap entry
+    is discarded lazily when it reaches the top, so every operation costs
+    O(log n) amortized regardless of the window size.
+    """
+
+    def __init__(self):
+        self.heap = []  # (deadline, seq_num), possibly stale
+        self.deadlines = {}  # seq_num -> current deadline
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def schedule(self, seq_num, deadline):
+        self.deadlines[seq_num] = deadline
+        heapq.heappush(self.heap, (deadline, seq_num))
+
+    def cancel(self, seq_num):
+        self.deadlines.pop(seq_num, None)
+
+    def next_deadline(self):
+        """Return the earliest pending deadline, or None if no timer is running."""
+        heap = self.heap
+        while heap and self.deadlines.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_expired(self, now):
+        """Remove and return the sequence numbers whose deadline is at or before ``now``."""
+        expired = []
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                return expired
+            _, seq_num = heapq.heappop(self.heap)
+            del self.deadlines[seq_num]
+            expired.append(seq_num)
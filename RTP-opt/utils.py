@@ -1,18 +1,51 @@
 import binascii
-import six
+import struct
 
-from scapy.all import Packet, IntField
-
-
-class PacketHeader(Packet):
-    name = "PacketHeader"
-    fields_desc = [
-        IntField("type", 0),
-        IntField("seq_num", 0),
-        IntField("length", 0),
-        IntField("checksum", 0),
-    ]
+_ZERO_CHECKSUM = bytes(4)
+_LENGTH_AND_CHECKSUM = struct.Struct("!II")  # Header fields at byte offset 8
 
 
 def compute_checksum(pkt):
     return binascii.crc32(bytes(pkt)) & 0xFFFFFFFF
+
+
+def header_checksum(header, payload=b""):
+    """CRC32 of a 16-byte header with its checksum field zeroed, then the payload.
+
+    Gives the same value as compute_checksum() on the concatenated packet, but
+    chains binascii.crc32 over the pieces instead of copying them together.
+    """
+    crc = binascii.crc32(header[:12])
+    crc = binascii.crc32(_ZERO_CHECKSUM, crc)
+    return binascii.crc32(payload, crc) & 0xFFFFFFFF
+
+
+def verify_checksum(datagram):
+    """Check the checksum of a received datagram in place."""
+    view = memoryview(datagram)
+    if len(view) < 16:
+        return False
+    length, checksum = _LENGTH_AND_CHECKSUM.unpack_from(view, 8)
+    return header_checksum(view, view[16:16 + length]) == checksum
+
+
+def __getattr__(name):
+    # Importing scapy.all takes around a second, so the scapy PacketHeader is
+    # only built when something still asks for it. The hot path uses codec.py.
+    if name == "PacketHeader":
+        global PacketHeader
+        from scapy.all import Packet, IntField
+        from scapy.config import conf
+        conf.route.resync = lambda: None  # Override route resync method
+
+        class PacketHeader(Packet):
+            name = "PacketHeader"
+            fields_desc = [
+                IntField("type", 0),
+                IntField("seq_num", 0),
+                IntField("length", 0),
+                IntField("checksum", 0),
+            ]
+
+        return PacketHeader
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
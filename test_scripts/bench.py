@@ -0,0 +1,191 @@
+"""Throughput and latency benchmark of RTP-base against RTP-opt.
+
+Usage: python test_scripts/bench.py [--variants RTP-base,RTP-opt] [--sizes 100000,1000000]
+       [--windows 16,128] [--error-types ,3,0123] [--fec ,8:1] [--payload-sizes ,8000]
+       [--runs N] [--seed S] [--out DIR]
+       python test_scripts/bench.py --plot DIR/results.json
+
+Every combination of variant, message size, window size, proxy error types,
+FEC setting and payload size is run ``--runs`` times. Each run starts a
+receiver, proxy.py (unless the error types are empty, which connects the
+sender straight to the receiver) and a sender on free localhost ports, and
+sends random bytes through them (see benchutil.py). A FEC setting
+GROUP:PARITY is passed to the sender as ``--fec-group GROUP --fec-parity
+PARITY``; an empty one leaves FEC off. For example, ``--error-types 3 --fec
+,8:1,8:2`` shows how parity changes completion time when the proxy drops
+packets. A payload size is passed to the sender as ``--payload-size`` and
+to the receiver as ``--max-payload``; an empty one keeps the default of
+1456 bytes. A run records:
+
+* completion time, from starting the sender until it exits, after its END
+  is acknowledged (the receiver lingers on to answer repeated ENDs, which
+  is not counted)
+* goodput, message bytes over completion time
+* retransmitted packets, as reported by the sender
+* CPU per byte, the user and system time of sender and receiver together
+
+The message bytes and the proxy's random choices are derived from
+``--seed``, so a rerun sends the same data through the same impairments.
+Results go to results.json and results.csv in ``--out``, together with
+plots if matplotlib is installed; ``--plot`` redraws the plots from a
+results.json.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import tempfile
+
+import benchutil
+
+MAX_PAYLOAD_SIZE = 1456  # The senders' default payload, the smallest --max-payload receivers take
+FIELDS = ("variant", "size", "window", "error_types", "fec", "payload", "run", "seed", "ok", "seconds",
+          "goodput_mbps", "retransmits", "cpu_seconds", "cpu_ns_per_byte")
+
+
+def transfer(variant, data_path, size, window, error_types, seed, fec="", payload=""):
+    """Run one transfer and return its row of results."""
+    sender_args = []
+    receiver_args = []
+    if fec:
+        group, _, parity = fec.partition(":")
+        sender_args += ["--fec-group", group, "--fec-parity", parity or "1"]
+    if payload:
+        # The receiver only accepts payloads above the default up to its --max-payload
+        sender_args += ["--payload-size", payload]
+        receiver_args += ["--max-payload", str(max(int(payload), MAX_PAYLOAD_SIZE))]
+    result = benchutil.transfer(variant, data_path, window, sender_args, receiver_args, error_types, seed)
+    row = {"variant": variant, "size": size, "window": window, "error_types": error_types, "fec": fec,
+           "payload": payload, "seed": seed, "goodput_mbps": None, "cpu_ns_per_byte": None}
+    row.update(result)
+    if result["seconds"] is not None:
+        row["goodput_mbps"] = size * 8 / result["seconds"] / 1e6
+        row["cpu_ns_per_byte"] = result["cpu_seconds"] / size * 1e9 if size else None
+    return row
+
+
+def mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def summarize(rows):
+    """Average the runs of each configuration."""
+    summary = []
+    key = lambda r: (r["variant"], r["size"], r["window"], r["error_types"], r["fec"], r["payload"])
+    for config, runs in itertools.groupby(sorted(rows, key=key), key=key):
+        runs = list(runs)
+        entry = dict(zip(("variant", "size", "window", "error_types", "fec", "payload"), config))
+        entry["runs"] = len(runs)
+        entry["failed"] = sum(not r["ok"] for r in runs)
+        for field in ("seconds", "goodput_mbps", "retransmits", "cpu_ns_per_byte"):
+            entry[field] = mean(r[field] for r in runs)
+        summary.append(entry)
+    return summary
+
+
+def plot(results, out_dir):
+    """Draw goodput and CPU per byte against message size, one figure per window and error types.
+
+    Each variant, FEC setting and payload size gets its own line.
+    """
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed; skipping plots")
+        return
+    summary = results["summary"]
+    configs = sorted({(s["window"], s["error_types"]) for s in summary})
+    for window, error_types in configs:
+        fig, (goodput_ax, cpu_ax) = plt.subplots(1, 2, figsize=(11, 4))
+        for variant, fec, payload in itertools.product(results["variants"], results.get("fec", [""]),
+                                                       results.get("payload", [""])):
+            points = sorted((s["size"], s["goodput_mbps"], s["cpu_ns_per_byte"]) for s in summary
+                            if (s["variant"], s["window"], s["error_types"], s.get("fec", ""),
+                                s.get("payload", "")) == (variant, window, error_types, fec, payload))
+            sizes = [p[0] for p in points]
+            label = variant + (f" FEC {fec}" if fec else "") + (f" payload {payload}" if payload else "")
+            goodput_ax.plot(sizes, [p[1] for p in points], marker="o", label=label)
+            cpu_ax.plot(sizes, [p[2] for p in points], marker="o", label=label)
+        for ax, label in ((goodput_ax, "goodput (Mbit/s)"), (cpu_ax, "CPU per byte (ns)")):
+            ax.set_xscale("log")
+            ax.set_xlabel("message size (bytes)")
+            ax.set_ylabel(label)
+            ax.legend()
+        fig.suptitle(f"window {window}, error types '{error_types or 'none'}'")
+        fig.tight_layout()
+        path = os.path.join(out_dir, f"bench_w{window}_e{error_types or 'none'}.png")
+        fig.savefig(path)
+        plt.close(fig)
+        print(f"Wrote {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--variants", default="RTP-base,RTP-opt", help="Comma-separated folders to compare")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated message sizes in bytes")
+    parser.add_argument("--windows", default="128", help="Comma-separated window sizes")
+    parser.add_argument("--error-types", default=",0123",
+                        help="Comma-separated proxy.py error types; an empty entry runs without the proxy")
+    parser.add_argument("--fec", default="",
+                        help="Comma-separated FEC settings GROUP:PARITY for the sender; an empty entry disables FEC")
+    parser.add_argument("--payload-sizes", default="",
+                        help="Comma-separated DATA payload sizes in bytes; an empty entry keeps the default")
+    parser.add_argument("--runs", type=int, default=3, help="Transfers per configuration")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the message bytes and the proxy")
+    parser.add_argument("--out", default="bench_results", help="Directory for results and plots")
+    parser.add_argument("--plot", metavar="RESULTS_JSON", help="Only redraw the plots from this results file")
+    args = parser.parse_args()
+
+    if args.plot:
+        with open(args.plot) as f:
+            plot(json.load(f), os.path.dirname(os.path.abspath(args.plot)))
+        return
+
+    variants = args.variants.split(",")
+    sizes = [int(size) for size in args.sizes.split(",")]
+    windows = [int(window) for window in args.windows.split(",")]
+    error_types = args.error_types.split(",")
+    fec_settings = args.fec.split(",")
+    payloads = args.payload_sizes.split(",")
+    os.makedirs(args.out, exist_ok=True)
+
+    rows = []
+    print(f"{'variant':<10}{'size':>10}{'window':>8}{'errors':>8}{'fec':>6}{'payload':>8}{'run':>5}"
+          f"{'seconds':>10}{'Mbit/s':>10}{'retx':>7}{'ns/byte':>10}  ok")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            # The same bytes for every variant and run of this size
+            data_path = os.path.join(tmp, f"message_{size}")
+            with open(data_path, "wb") as f:
+                f.write(random.Random(f"{args.seed}:{size}").randbytes(size))
+            for window, errors, fec, payload, run, variant in itertools.product(
+                    windows, error_types, fec_settings, payloads, range(args.runs), variants):
+                # Both variants see the same impairments in the same run
+                row = transfer(variant, data_path, size, window, errors, args.seed + run, fec, payload)
+                row["run"] = run
+                rows.append(row)
+                fmt = lambda value, spec: format(value, spec) if value is not None else "-"
+                print(f"{variant:<10}{size:>10}{window:>8}{errors or '-':>8}{fec or '-':>6}{payload or '-':>8}"
+                      f"{run:>5}{fmt(row['seconds'], '10.3f'):>10}{fmt(row['goodput_mbps'], '10.2f'):>10}"
+                      f"{fmt(row['retransmits'], '7d'):>7}{fmt(row['cpu_ns_per_byte'], '10.1f'):>10}  {row['ok']}")
+
+    results = {"seed": args.seed, "variants": variants, "fec": fec_settings, "payload": payloads, "runs": rows,
+               "summary": summarize(rows)}
+    json_path = os.path.join(args.out, "results.json")
+    with open(json_path, "w") as f:
+        json.dump(results, f, indent=2)
+    with open(os.path.join(args.out, "results.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Wrote {json_path} and results.csv")
+    plot(results, args.out)
+
+
+if __name__ == "__main__":
+    main()
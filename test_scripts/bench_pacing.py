@@ -0,0 +1,63 @@
+"""Compare retransmissions with and without sender pacing.
+
+Usage: python test_scripts/bench_pacing.py [--variant RTP-opt] [--size BYTES] [--runs N]
+
+Each run starts a receiver and a sender on localhost with test.sh's 128-packet
+window and sends ``--size`` random bytes (or test_message.txt with
+``--size 0``). Packets dropped by the kernel when a burst overflows the
+receiver's socket buffer show up as retransmissions, which the sender
+reports. Results are averaged over ``--runs`` runs per configuration.
+"""
+import argparse
+import os
+import tempfile
+
+import benchutil
+
+WINDOW_SIZE = 128
+CONFIGS = (
+    ("unpaced", []),
+    ("cwnd/srtt", ["--pacing"]),
+)
+
+
+def transfer(variant, input_path, sender_args):
+    """Run one transfer; return (seconds, retransmitted packets, output matches input)."""
+    result = benchutil.transfer(variant, input_path, WINDOW_SIZE, sender_args, stdin=True)
+    return result["seconds"], result["retransmits"], result["ok"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--variant", default="RTP-opt", help="Folder to run sender.py and receiver.py from")
+    parser.add_argument("--size", type=int, default=4 * 1024 * 1024,
+                        help="Bytes of random data to send (0 sends test_message.txt)")
+    parser.add_argument("--runs", type=int, default=5, help="Transfers per configuration")
+    parser.add_argument("--pace-rate", type=float, help="Also measure this fixed pacing rate (packets/s)")
+    args = parser.parse_args()
+
+    configs = list(CONFIGS)
+    if args.pace_rate:
+        configs.append((f"{args.pace_rate:g} pkt/s", ["--pace-rate", str(args.pace_rate)]))
+
+    with tempfile.NamedTemporaryFile() as data:
+        if args.size:
+            data.write(os.urandom(args.size))
+            data.flush()
+            input_path = data.name
+        else:
+            input_path = os.path.join(benchutil.DIR, "test_message.txt")
+
+        print(f"{'pacing':<16}{'seconds':>10}{'retransmits':>14}{'failed':>8}")
+        for name, sender_args in configs:
+            runs = [transfer(args.variant, input_path, sender_args) for _ in range(args.runs)]
+            times = [r[0] for r in runs if r[0] is not None]
+            seconds = sum(times) / len(times) if times else float("nan")
+            retransmits = [r[1] for r in runs if r[1] is not None]
+            mean = sum(retransmits) / len(retransmits) if retransmits else float("nan")
+            failed = sum(not r[2] for r in runs)
+            print(f"{name:<16}{seconds:>10.3f}{mean:>14.1f}{failed:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Measure striped transfer throughput against the number of stripes.
+
+Usage: python test_scripts/bench_stripes.py [--variant RTP-opt] [--size BYTES] [--runs N] [--stripes 1,2,4]
+
+Each run starts a receiver writing to a file and a sender with ``--input``
+and ``--stripes N`` on localhost, and times the transfer of ``--size``
+random bytes. With one stripe this is the plain sender. Every stripe runs in
+its own process, so throughput can only scale up to the number of cores,
+which is printed first; the receiver is a single process either way.
+"""
+import argparse
+import os
+import tempfile
+
+import benchutil
+
+WINDOW_SIZE = 128
+RUN_TIMEOUT = 300  # Seconds before a run is killed and counted as failed
+
+
+def transfer(variant, input_path, stripes, sender_args):
+    """Run one transfer; return (seconds, output matches input)."""
+    result = benchutil.transfer(variant, input_path, WINDOW_SIZE, ["--stripes", str(stripes)] + sender_args,
+                                timeout=RUN_TIMEOUT)
+    return result["seconds"], result["ok"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--variant", default="RTP-opt", help="Folder to run sender.py and receiver.py from")
+    parser.add_argument("--size", type=int, default=64 * 1024 * 1024, help="Bytes of random data to send")
+    parser.add_argument("--runs", type=int, default=3, help="Transfers per stripe count")
+    parser.add_argument("--stripes", default="1,2,4,8", help="Comma-separated stripe counts to measure")
+    parser.add_argument("--sack-blocks", type=int, default=8, help="Passed on to the sender")
+    args = parser.parse_args()
+
+    sender_args = ["--sack-blocks", str(args.sack_blocks)]
+    print(f"{os.cpu_count()} cores, {args.size} bytes")
+
+    with tempfile.NamedTemporaryFile() as data:
+        data.write(os.urandom(args.size))
+        data.flush()
+
+        print(f"{'stripes':<10}{'seconds':>10}{'MB/s':>10}{'speedup':>10}{'failed':>8}")
+        baseline = None
+        for stripes in map(int, args.stripes.split(",")):
+            runs = [transfer(args.variant, data.name, stripes, sender_args) for _ in range(args.runs)]
+            times = [r[0] for r in runs if r[0] is not None]
+            seconds = sum(times) / len(times) if times else float("nan")
+            baseline = baseline or seconds
+            failed = sum(not r[1] for r in runs)
+            print(f"{stripes:<10}{seconds:>10.3f}{args.size / seconds / 1e6:>10.1f}"
+                  f"{baseline / seconds:>10.2f}{failed:>8}")
+
+
+if __name__ == "__main__":
+    main()
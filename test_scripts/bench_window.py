@@ -0,0 +1,123 @@
+"""Microbenchmark of the ring-buffer windows against the dicts they replaced.
+
+Usage: python test_scripts/bench_window.py [--packets N] [--variant RTP-opt]
+
+Each run pushes ``--packets`` packets through a window, acknowledging (send
+side) or delivering (receive side) them in a seeded random order within each
+window, and reports the time per packet, the peak memory allocated and the
+number of garbage collector runs it triggered.
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+WINDOW_SIZES = (128, 1024, 16384)
+CHUNK_SIZE = 1456
+
+
+def arrival_order(packets, window_size, seed):
+    """Sequence numbers from 1, shuffled within consecutive blocks of ``window_size``."""
+    rng = random.Random(seed)
+    order = []
+    for start in range(1, packets + 1, window_size):
+        block = list(range(start, min(start + window_size, packets + 1)))
+        rng.shuffle(block)
+        order.extend(block)
+    return order
+
+
+def send_dict(order, window_size, chunk):
+    from codec import DATA, make_header
+    window = {}
+    base = next_seq = 1
+    for ack_seq in order:
+        while next_seq < base + window_size and next_seq <= len(order):
+            window[next_seq] = (make_header(DATA, next_seq, chunk), chunk, time.monotonic(), False)
+            next_seq += 1
+        header, chunk, sent_time, _ = window[ack_seq]
+        window[ack_seq] = (header, chunk, sent_time, True)
+        while base in window and window[base][3]:
+            del window[base]
+            base += 1
+
+
+def send_ring(order, window_size, chunk):
+    from window import SendWindow
+    window = SendWindow(window_size)
+    base = next_seq = 1
+    for ack_seq in order:
+        while next_seq < base + window_size and next_seq <= len(order):
+            window.add(next_seq, chunk, time.monotonic())
+            next_seq += 1
+        if not window.is_acked(ack_seq):
+            window.mark_acked(ack_seq)
+        base = window.advance(base, next_seq)
+
+
+def recv_dict(order, window_size, chunk):
+    buffer = {}
+    expected = 1
+    out = bytearray()
+    for seq_num in order:
+        buffer[seq_num] = bytes(chunk)
+        while expected in buffer:
+            out += buffer.pop(expected)
+            expected += 1
+        del out[:]
+
+
+def recv_ring(order, window_size, chunk):
+    from window import ReorderBuffer
+    buffer = ReorderBuffer(window_size, CHUNK_SIZE)
+    out = bytearray()
+    expected = 1
+    for seq_num in order:
+        buffer.put(seq_num, chunk)
+        expected = buffer.pop_run(expected, out)
+        del out[:]
+
+
+def measure(func, order, window_size, chunk):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(order, window_size, chunk)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # tracemalloc slows allocation-heavy code down; time a second, untraced run
+    collections = sum(gen["collections"] for gen in gc.get_stats())
+    start = time.perf_counter()
+    func(order, window_size, chunk)
+    elapsed = time.perf_counter() - start
+    collections = sum(gen["collections"] for gen in gc.get_stats()) - collections
+    return elapsed / len(order) * 1e9, peak, collections
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--packets", type=int, default=200000, help="Packets per run")
+    parser.add_argument("--variant", default="RTP-opt", help="Folder to import window.py from")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the arrival order")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", args.variant))
+    import window  # noqa: F401  Import up front so it is not counted in the first run
+    chunk = memoryview(bytes(CHUNK_SIZE))
+
+    print(f"{'side':<8}{'window':>8}{'dict ns/pkt':>14}{'ring ns/pkt':>14}"
+          f"{'dict peak KiB':>16}{'ring peak KiB':>16}{'dict GCs':>10}{'ring GCs':>10}")
+    for side, dict_func, ring_func in (("send", send_dict, send_ring), ("receive", recv_dict, recv_ring)):
+        for window_size in WINDOW_SIZES:
+            order = arrival_order(args.packets, window_size, args.seed)
+            dict_ns, dict_peak, dict_gcs = measure(dict_func, order, window_size, chunk)
+            ring_ns, ring_peak, ring_gcs = measure(ring_func, order, window_size, chunk)
+            print(f"{side:<8}{window_size:>8}{dict_ns:>14.0f}{ring_ns:>14.0f}"
+                  f"{dict_peak / 1024:>16.0f}{ring_peak / 1024:>16.0f}{dict_gcs:>10}{ring_gcs:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Setup shared by the benchmarks: one timed transfer on localhost.
+
+``transfer`` starts receiver.py writing to a temporary file, proxy.py in
+front of it if error types are given, and sender.py on free ports, then
+checks that the file matches the input.
+"""
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+RUN_TIMEOUT = 120  # Seconds before a run is killed and counted as failed
+STARTUP_DELAY = 0.3  # Seconds for the receiver and proxy to bind before the sender starts
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_rusage(proc, deadline):
+    """Reap ``proc`` with os.wait4() by ``deadline``; return its CPU seconds, or None if it had to be killed."""
+    while time.monotonic() < deadline:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return usage.ru_utime + usage.ru_stime
+        time.sleep(0.005)
+    proc.kill()
+    proc.wait()
+    return None
+
+
+def transfer(variant, input_path, window, sender_args=(), receiver_args=(), error_types="", seed=0,
+             stdin=False, timeout=RUN_TIMEOUT):
+    """Send ``input_path`` with the sender and receiver in the ``variant`` folder.
+
+    The sender gets the file with --input, or on stdin if ``stdin`` is set.
+    Returns a dict of:
+
+    * ok: whether the receiver's output matches the input
+    * seconds: from starting the sender until it exits, once its END is
+      acknowledged; the receiver's linger for repeated ENDs is not counted
+    * retransmits: retransmitted packets, as reported by the sender
+    * cpu_seconds: the user and system time of sender and receiver together
+
+    The last three are None if a process had to be killed after ``timeout``.
+    """
+    folder = os.path.join(DIR, "..", variant)
+    recv_port = free_port()
+    result = {"ok": False, "seconds": None, "retransmits": None, "cpu_seconds": None}
+    proxy = None
+    with tempfile.NamedTemporaryFile() as output, tempfile.TemporaryFile("w+") as sender_out, \
+            open(input_path, "rb") as source:
+        receiver = subprocess.Popen(
+            [sys.executable, os.path.join(folder, "receiver.py"), "127.0.0.1", str(recv_port), str(window),
+             "--output", output.name] + list(receiver_args),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        port = recv_port
+        if error_types:
+            port = free_port()
+            proxy = subprocess.Popen(
+                [sys.executable, os.path.join(DIR, "proxy.py"), "127.0.0.1", str(port), "127.0.0.1",
+                 str(recv_port), error_types, "--seed", str(seed)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(STARTUP_DELAY)
+        input_args = [] if stdin else ["--input", input_path]
+        try:
+            start = time.perf_counter()
+            deadline = time.monotonic() + timeout
+            sender = subprocess.Popen(
+                [sys.executable, os.path.join(folder, "sender.py"), "127.0.0.1", str(port), str(window)]
+                + input_args + list(sender_args),
+                stdin=source if stdin else subprocess.DEVNULL, stdout=sender_out, stderr=subprocess.DEVNULL)
+            sender_cpu = wait_rusage(sender, deadline)
+            elapsed = time.perf_counter() - start
+            receiver_cpu = wait_rusage(receiver, deadline)
+        finally:
+            for proc in (receiver, proxy):
+                if proc is not None and proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+
+        sender_out.seek(0)
+        match = re.search(r"[Rr]etransmitted packets: (\d+)", sender_out.read())
+        source.seek(0)
+        result["ok"] = source.read() == open(output.name, "rb").read()
+    if sender_cpu is None or receiver_cpu is None:
+        return result
+    result["seconds"] = elapsed
+    result["retransmits"] = int(match.group(1)) if match else None
+    result["cpu_seconds"] = sender_cpu + receiver_cpu
+    return result
@@ -1,160 +1,310 @@
+"""Network impairment proxy between RTP senders and a receiver.
+
+Usage: python proxy.py BIND_ADDR BIND_PORT RECEIVER_ADDR RECEIVER_PORT [ERROR_TYPES]
+       [--seed S] [--loss P] [--delay MS] [--jitter MS] [--reorder P] [--reorder-gap MS]
+       [--duplicate P] [--corrupt P] [--rate MBIT] [--queue PACKETS] [--clean-start N]
+       [--idle-timeout S]
+
+Senders talk to BIND_ADDR:BIND_PORT. Each sender address gets its own socket
+towards the receiver, so several senders can share the proxy; the socket is
+closed once neither side has sent through it for --idle-timeout seconds, so
+a long-running proxy does not collect one per benchmark run. Packets are
+handled as they arrive, independently in each direction: "forward" is
+sender to receiver and "reverse" is receiver to sender. Each direction has
+its own seeded random number generator and its own impairments:
+
+* loss: drop the packet with probability P
+* corrupt: flip one byte with probability P
+* duplicate: send the packet twice with probability P
+* rate and queue: serialize packets at MBIT Mbit/s through a queue of at
+  most PACKETS packets; arrivals at a full queue are dropped
+* delay and jitter: delay every packet by MS plus up to jitter MS
+* reorder: hold the packet back an extra reorder-gap MS with probability
+  P, so that later packets overtake it
+
+A value applies to both directions; "F,R" sets forward and reverse
+separately. Delayed packets wait in a timer heap, so they never stall other
+traffic. Datagrams are received and sent in batches with recvmmsg and
+sendmmsg by RTP-opt/batchio.py, which is imported from there (with the
+codec.py it needs), so proxy.py has to stay next to RTP-opt. The first
+``--clean-start`` packets in each direction pass untouched, which keeps the
+START handshake intact.
+
+ERROR_TYPES keeps the old interface: a string of digits where 1 holds a
+packet back 0.4 s, 2 reorders, 3 drops and any other digit corrupts. A
+fifth of the packets are impaired, with the listed types equally likely.
+Counters for each direction are printed on exit.
+"""
 import argparse
+import heapq
+import os
 import random
+import selectors
+import signal
 import socket
+import sys
 import time
+from collections import deque
+
+# recvmmsg/sendmmsg batching, shared with the RTP implementations: keep
+# test_scripts next to RTP-opt, or copy batchio.py and codec.py here
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "RTP-opt"))
+from batchio import DEFAULT_BATCH, RecvBatch, SendBatch
+
+MAX_DATAGRAM = 9216  # Largest datagram forwarded; longer ones are truncated
+SOCKET_BUFFER = 4 * 1024 * 1024
+ERROR_RATE = 0.2  # Share of packets impaired by ERROR_TYPES
+SPIKE_DELAY = 0.4  # Seconds a packet is held by error type 1
+REORDER_GAP = 0.001  # Seconds a reordered packet is held back
+CLEAN_START = 10
+DEFAULT_IDLE_TIMEOUT = 60.0  # Seconds without traffic before a sender's upstream socket is closed
+
+
+class Direction:
+    """Impairments applied to the packets travelling one way through the proxy.
+
+    ``holds`` is a list of (probability, seconds) pairs: with that
+    probability a packet is held back that many extra seconds. ``rate`` is in
+    bytes per second, 0 for unlimited.
+    """
+
+    def __init__(self, name, rng, loss=0.0, corrupt=0.0, duplicate=0.0, delay=0.0, jitter=0.0,
+                 holds=(), rate=0.0, queue_limit=1000, clean_start=CLEAN_START):
+        self.name = name
+        self.rng = rng
+        self.loss = loss
+        self.corrupt = corrupt
+        self.duplicate = duplicate
+        self.delay = delay
+        self.jitter = jitter
+        self.holds = [hold for hold in holds if hold[0]]
+        self.rate = rate
+        self.queue_limit = queue_limit
+        self.clean_start = clean_start
+        self.link_free = 0.0  # When the rate-limited link finishes sending its queue
+        self.departures = deque()  # Departure times of the packets queued on the link
+        self.stats = dict.fromkeys(("packets", "forwarded", "lost", "corrupted", "duplicated", "held",
+                                    "queue_drops"), 0)
+
+    def plan(self, pkt, now):
+        """Return the (time, packet) deliveries for ``pkt`` arriving at ``now``; empty if it is dropped."""
+        stats = self.stats
+        stats["packets"] += 1
+        if stats["packets"] <= self.clean_start:
+            return [(now, pkt)]
+        rng = self.rng
+        if self.loss and rng.random() < self.loss:
+            stats["lost"] += 1
+            return []
+        if self.corrupt and rng.random() < self.corrupt:
+            pkt = bytearray(pkt)
+            pkt[rng.randrange(len(pkt))] ^= rng.randrange(1, 256)
+            stats["corrupted"] += 1
+        copies = 1
+        if self.duplicate and rng.random() < self.duplicate:
+            copies = 2
+            stats["duplicated"] += 1
 
-from scapy.all import IntField, Packet
+        deliveries = []
+        for _ in range(copies):
+            at = now
+            if self.rate:
+                # Tail drop once the link's queue is full, then serialize behind it
+                departures = self.departures
+                while departures and departures[0] <= now:
+                    departures.popleft()
+                if len(departures) >= self.queue_limit:
+                    stats["queue_drops"] += 1
+                    continue
+                self.link_free = max(self.link_free, now) + len(pkt) / self.rate
+                departures.append(self.link_free)
+                at = self.link_free
+            at += self.delay
+            if self.jitter:
+                at += rng.random() * self.jitter
+            for probability, seconds in self.holds:
+                if rng.random() < probability:
+                    at += seconds
+                    stats["held"] += 1
+            deliveries.append((at, pkt))
+        return deliveries
 
 
-class PacketHeader(Packet):
-    name = "PacketHeader"
-    fields_desc = [
-        IntField("type", 0),
-        IntField("seq_num", 0),
-        IntField("length", 0),
-        IntField("checksum", 0),
-    ]
+def per_direction(kind):
+    """argparse type for "VALUE" (both directions) or "FORWARD,REVERSE"."""
+    def parse(text):
+        values = [kind(value) for value in text.split(",")]
+        if len(values) not in (1, 2):
+            raise argparse.ArgumentTypeError("expected VALUE or FORWARD,REVERSE")
+        return values * 2 if len(values) == 1 else values
+    return parse
 
 
-def get_seq_num(pkt):
-    if len(pkt) > 1500:
-        print("Error! Packet size exceeds 1500")
-    pkt_header = PacketHeader(pkt[:16])
-    pkt_type = "START/END"
-    if pkt_header.type == 2:
-        pkt_type = "DATA"
-    elif pkt_header.type == 3:
-        pkt_type = "ACK"
-    return pkt_type, pkt_header.seq_num
+def directions(args):
+    """Build the forward and reverse Directions from the command line."""
+    # ERROR_TYPES: a fifth of the packets get one of the listed impairments, each equally likely
+    weights = {}
+    for error_type in args.error_types:
+        kind = {"1": "spike", "2": "reorder", "3": "loss"}.get(error_type, "corrupt")
+        weights[kind] = weights.get(kind, 0) + ERROR_RATE / len(args.error_types)
+
+    result = []
+    for i, name in enumerate(("forward", "reverse")):
+        rng = random.Random(f"{args.seed}:{name}") if args.seed is not None else random.Random()
+        holds = [(args.reorder[i] or weights.get("reorder", 0), args.reorder_gap[i] / 1000),
+                 (weights.get("spike", 0), SPIKE_DELAY)]
+        result.append(Direction(
+            name, rng,
+            loss=args.loss[i] or weights.get("loss", 0),
+            corrupt=args.corrupt[i] or weights.get("corrupt", 0),
+            duplicate=args.duplicate[i],
+            delay=args.delay[i] / 1000,
+            jitter=args.jitter[i] / 1000,
+            holds=holds,
+            rate=args.rate[i] * 1e6 / 8,
+            queue_limit=args.queue[i],
+            clean_start=args.clean_start,
+        ))
+    return result
+
+
+def open_socket(selector, sockets, batch_size, data):
+    """Create a non-blocking UDP socket with its batches and watch it for reading."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER)
+    sock.setblocking(False)
+    sockets[sock] = (RecvBatch(sock, batch_size, MAX_DATAGRAM), SendBatch(sock, batch_size, MAX_DATAGRAM))
+    selector.register(sock, selectors.EVENT_READ, data)
+    return sock
+
+
+def close_idle(selector, sockets, upstreams, last_active, now, idle_timeout):
+    """Close the upstream sockets of senders that have been quiet for ``idle_timeout`` seconds."""
+    for address, active in list(last_active.items()):
+        if now - active >= idle_timeout:
+            sock = upstreams.pop(address)
+            del last_active[address], sockets[sock]
+            selector.unregister(sock)
+            sock.close()
+
+
+def run(bind, receiver, forward, reverse, batch_size=DEFAULT_BATCH, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """Forward packets between senders and the receiver until interrupted."""
+    selector = selectors.DefaultSelector()
+    sockets = {}  # Socket -> (RecvBatch, SendBatch)
+    listener = open_socket(selector, sockets, batch_size, None)
+    listener.bind(bind)
+    upstreams = {}  # Sender address -> socket towards the receiver
+    last_active = {}  # Sender address -> when a packet last went through its upstream socket
+    next_sweep = time.monotonic() + idle_timeout
+    pending = []  # Heap of (time, order, SendBatch, packet, address, stats) still to be sent
+    order = 0  # Keeps packets due at the same time in arrival order
+    queued = set()  # SendBatches to flush before sleeping again
+
+    while True:
+        now = time.monotonic()
+        timeout = max(pending[0][0] - now, 0) if pending else None
+        if upstreams:
+            # Wake up to close idle upstream sockets
+            sweep = max(next_sweep - now, 0)
+            timeout = sweep if timeout is None else min(timeout, sweep)
+        for key, _ in selector.select(timeout):
+            sock = key.fileobj
+            sender = key.data  # None for the listener, else the sender this socket belongs to
+            direction = forward if sender is None else reverse
+            try:
+                received = sockets[sock][0].recv()
+            except ConnectionRefusedError:
+                continue
+            now = time.monotonic()
+            if sender is not None and received:
+                last_active[sender] = now
+            for pkt, address in received:
+                if sender is None:
+                    out = upstreams.get(address)
+                    if out is None:
+                        out = upstreams[address] = open_socket(selector, sockets, batch_size, address)
+                    last_active[address] = now
+                    destination = receiver
+                else:
+                    out, destination = listener, sender
+                outgoing = sockets[out][1]
+                for at, copy in direction.plan(pkt, now):
+                    if at <= now and not pending:
+                        outgoing.queue((copy,), destination)
+                        direction.stats["forwarded"] += 1
+                        queued.add(outgoing)
+                    else:
+                        # Received datagrams are views into reused buffers
+                        order += 1
+                        heapq.heappush(pending, (at, order, outgoing, bytes(copy), destination, direction.stats))
+
+        now = time.monotonic()
+        while pending and pending[0][0] <= now:
+            _, _, outgoing, pkt, destination, stats = heapq.heappop(pending)
+            outgoing.queue((pkt,), destination)
+            stats["forwarded"] += 1
+            queued.add(outgoing)
+        for outgoing in queued:
+            try:
+                outgoing.flush()
+            except (BlockingIOError, ConnectionRefusedError):
+                pass  # Dropped, like a full interface queue
+        queued.clear()
+        if now >= next_sweep:
+            close_idle(selector, sockets, upstreams, last_active, now, idle_timeout)
+            next_sweep = now + idle_timeout
 
 
 def main():
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(description="Emulate loss, delay, reordering and rate limits between sender and receiver")
     parser.add_argument("bind_addr", help="Binding address (sender address)")
     parser.add_argument("bind_port", type=int, help="Binding port (sender port)")
     parser.add_argument("receiver_addr", help="Receiver address")
     parser.add_argument("receiver_port", type=int, help="Receiver port")
     parser.add_argument(
-        "error_types",
+        "error_types", nargs="?", default="",
         help=(
             "String of error types to simulate (e.g. '0123' for all types). "
             "1: delay, 2: reorder, 3: drop, other: jam"
         ),
     )
+    parser.add_argument("--seed", type=int, help="Seed the random choices, for reproducible runs")
+    parser.add_argument("--loss", type=per_direction(float), default=[0.0, 0.0], help="Drop probability")
+    parser.add_argument("--delay", type=per_direction(float), default=[0.0, 0.0], help="Delay in ms")
+    parser.add_argument("--jitter", type=per_direction(float), default=[0.0, 0.0],
+                        help="Extra random delay of up to this many ms")
+    parser.add_argument("--reorder", type=per_direction(float), default=[0.0, 0.0],
+                        help="Probability of holding a packet back by --reorder-gap")
+    parser.add_argument("--reorder-gap", type=per_direction(float), default=[REORDER_GAP * 1000] * 2,
+                        help="How long reordered packets are held back, in ms")
+    parser.add_argument("--duplicate", type=per_direction(float), default=[0.0, 0.0],
+                        help="Duplication probability")
+    parser.add_argument("--corrupt", type=per_direction(float), default=[0.0, 0.0],
+                        help="Probability of flipping one byte")
+    parser.add_argument("--rate", type=per_direction(float), default=[0.0, 0.0],
+                        help="Link rate in Mbit/s (0 for unlimited)")
+    parser.add_argument("--queue", type=per_direction(int), default=[1000, 1000],
+                        help="Packets the rate-limited link can queue")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH,
+                        help="Most datagrams received or sent per system call")
+    parser.add_argument("--clean-start", type=int, default=CLEAN_START,
+                        help="Packets passed untouched at the start of each direction")
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help="Close a sender's socket towards the receiver after this many seconds without traffic")
     args = parser.parse_args()
 
-    bind_addr = args.bind_addr
-    bind_port = args.bind_port
-    receiver_addr = args.receiver_addr
-    receiver_port = args.receiver_port
-    sender_addr = bind_addr
-    sender_port = [0]  # Act like a pointer to 0 to allow modification
-    options = args.error_types
-    start_stage = 0
-
-    def run(
-        from_addr, from_port, from_socket, to_addr, to_port, to_socket, start_stage
-    ):
-        def delay():
-            """Delay a packet by 0.4 seconds."""
-            pkt, _ = from_socket.recvfrom(2048)
-            pkt_type, seq_num = get_seq_num(pkt)
-            print(f"Got it: Delay. {pkt_type}: {seq_num}")
-            time.sleep(0.4)
-            to_socket.sendto(pkt, (to_addr, to_port))
-
-        def reorder():
-            """Take in 6 packets, reorder them, and send them out."""
-            num = 6
-            packet_list = []
-
-            for _ in range(num):
-                try:
-                    pkt, _ = from_socket.recvfrom(2048)
-                    pkt_type, seq_num = get_seq_num(pkt)
-                    print(f"Got it: Reorder. {pkt_type}: {seq_num}")
-                    packet_list.append(pkt)
-                except socket.error:
-                    break
-
-            random.shuffle(packet_list)
-            for pkt in packet_list:
-                to_socket.sendto(pkt, (to_addr, to_port))
-
-        def drop():
-            """Drop the next available packet."""
-            pkt, _ = from_socket.recvfrom(2048)
-            pkt_type, seq_num = get_seq_num(pkt)
-            print(f"Got it: Drop. {pkt_type}: {seq_num}")
-
-        def jam():
-            """Randomly change a byte from the packet to "a"."""
-            pkt, _ = from_socket.recvfrom(2048)
-            i = random.randint(0, len(pkt) - 1)
-            pkt = pkt[:i] + b"a" + pkt[i + 1 :]
-            pkt_type, seq_num = get_seq_num(pkt)
-            print(f"Got it: Jam. {pkt_type}: {seq_num}")
-            to_socket.sendto(pkt, (to_addr, to_port))
-
-        if start_stage < 10 or random.randint(1, 100) > 20:
-            pkt, address = from_socket.recvfrom(2048, socket.MSG_DONTWAIT)
-            if address[1] != receiver_port and address[1] != bind_port:
-                sender_port.pop(0)
-                sender_port.append(address[1])
-            pkt_type, seq_num = get_seq_num(pkt)
-            print(f"Got it: No messing. {pkt_type}: {seq_num}")
-            to_socket.sendto(pkt, (to_addr, to_port))
-        else:
-            mode = int(options[random.randrange(len(options))])
-            if mode == 1:
-                delay()
-            elif mode == 3:
-                drop()
-            elif mode == 2:
-                reorder()
-            else:
-                jam()
-
-    sender_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    receiver_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-
-    sender_socket.settimeout(0.1)
-    receiver_socket.settimeout(0.1)
-
-    sender_socket.bind((bind_addr, bind_port))
-
-    while True:
-        # The proxy alternatively forwards messages from sender to receiver and from
-        # receiver to sender; each turn transmits at most 5 packets
-        try:
-            for _ in range(5):
-                run(
-                    sender_addr,
-                    sender_port,
-                    sender_socket,
-                    receiver_addr,
-                    receiver_port,
-                    receiver_socket,
-                    start_stage,
-                )
-                start_stage += 1
-        except socket.error:
-            pass
-
-        try:
-            for _ in range(5):
-                run(
-                    receiver_addr,
-                    receiver_port,
-                    receiver_socket,
-                    sender_addr,
-                    sender_port[0],
-                    sender_socket,
-                    start_stage,
-                )
-                start_stage += 1
-        except socket.error:
-            pass
+    forward, reverse = directions(args)
+    # Print the counters on SIGTERM as well as on Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        run((args.bind_addr, args.bind_port), (args.receiver_addr, args.receiver_port), forward, reverse,
+            args.batch, args.idle_timeout)
+    except KeyboardInterrupt:
+        pass
+    for direction in (forward, reverse):
+        print(direction.name, " ".join(f"{key}={value}" for key, value in direction.stats.items()))
 
 
 if __name__ == "__main__":
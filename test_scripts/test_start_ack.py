@@ -0,0 +1,114 @@
+"""Check that a repeated START ACK is not taken for the ACK of DATA packet 1.
+
+Usage: python test_scripts/test_start_ack.py [--variants RTP-base,RTP-opt]
+
+A START ACK is an ACK with sequence number 1, like the ACK of the first
+DATA packet, so a copy that arrives late must not acknowledge DATA 1. Each
+case relays one transfer of test_message.txt through a proxy that drops
+the first copy of DATA 1 and, in its place, sends the sender the START
+ACK again. If the sender takes that for the ACK of DATA 1, it never
+resends the packet and the received message is missing its first chunk.
+"""
+import argparse
+import os
+import select
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchutil import DIR, STARTUP_DELAY, free_port
+
+HEADER = struct.Struct("!IIII")  # Type, sequence number, length, checksum
+START, DATA, ACK = 0, 2, 3
+CASES = (
+    ("RTP-base", [], []),
+    ("RTP-base", ["--sack-blocks", "4"], []),
+    ("RTP-opt", [], []),
+    ("RTP-opt", ["--sack-blocks", "4"], []),
+    ("RTP-opt", ["--asyncio"], []),
+    ("RTP-opt", ["--asyncio"], ["--asyncio"]),
+)
+TIMEOUT = 30  # Seconds a case may take
+
+
+def relay(listen, receiver_addr, stop):
+    """Relay datagrams between one sender and the receiver, dropping DATA 1 once and repeating the START ACK."""
+    upstream = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    upstream.connect(receiver_addr)
+    sender_addr = None
+    start_ack = None
+    dropped = False
+    while not stop.is_set():
+        for sock in select.select([listen, upstream], [], [], 0.1)[0]:
+            data, addr = sock.recvfrom(65535)
+            pkt_type, seq_num, _, _ = HEADER.unpack_from(data)
+            if sock is listen:
+                sender_addr = addr
+                if pkt_type == DATA and seq_num == 1 and not dropped and start_ack is not None:
+                    dropped = True
+                    listen.sendto(start_ack, sender_addr)
+                    continue
+                upstream.send(data)
+            elif sender_addr is not None:
+                if pkt_type == ACK and seq_num == 1 and start_ack is None:
+                    start_ack = data
+                listen.sendto(data, sender_addr)
+    upstream.close()
+
+
+def run_case(variant, sender_args, receiver_args, message):
+    folder = os.path.join(DIR, "..", variant)
+    recv_port = free_port()
+    listen = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    listen.bind(("127.0.0.1", 0))
+    stop = threading.Event()
+    thread = threading.Thread(target=relay, args=(listen, ("127.0.0.1", recv_port), stop))
+    thread.start()
+    with tempfile.NamedTemporaryFile() as output:
+        receiver = subprocess.Popen(
+            [sys.executable, os.path.join(folder, "receiver.py"), "127.0.0.1", str(recv_port), "16",
+             "--output", output.name] + receiver_args,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(STARTUP_DELAY)
+        try:
+            subprocess.run(
+                [sys.executable, os.path.join(folder, "sender.py"), "127.0.0.1", str(listen.getsockname()[1]), "16",
+                 "--input", message] + sender_args,
+                stdout=subprocess.DEVNULL, timeout=TIMEOUT)
+            receiver.wait(timeout=TIMEOUT)
+        except subprocess.TimeoutExpired:
+            pass
+        finally:
+            if receiver.poll() is None:
+                receiver.kill()
+                receiver.wait()
+            stop.set()
+            thread.join()
+            listen.close()
+        with open(message, "rb") as f:
+            return f.read() == open(output.name, "rb").read()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--variants", default="RTP-base,RTP-opt", help="Comma-separated folders to test")
+    args = parser.parse_args()
+
+    message = os.path.join(DIR, "test_message.txt")
+    failed = 0
+    for variant, sender_args, receiver_args in CASES:
+        if variant not in args.variants.split(","):
+            continue
+        ok = run_case(variant, sender_args, receiver_args, message)
+        failed += not ok
+        print(f"{'SUCCESS' if ok else 'FAILURE'}: {variant} sender {' '.join(sender_args) or '-'}, "
+              f"receiver {' '.join(receiver_args) or '-'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()